@@ -0,0 +1,211 @@
+# app/benchmarks/reco_benchmark.py
+"""
+Recommendation scaling benchmark on synthetic catalogs.
+
+    python -m app.benchmarks.reco_benchmark --sizes 1000 10000 100000 --queries 200
+    python -m app.benchmarks.reco_benchmark --sizes 10000000 --modes columnar   # big box only
+
+Reports p50/p99 latency, throughput and peak memory for the rules path (per-service and
+columnar), FeatureBuilder, and the ML path (rules candidates + score_services_ml), and writes
+one JSON file per run so results can be diffed between commits.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.features.feature_builder import FeatureBuilder
+from app.features.feature_config import FeatureConfig
+from app.models.service_model import ServiceModel
+from app.models.service_result import ServiceResult
+from app.services.ml_ranker import score_services_ml
+from app.services.opening_hours import ClockSnapshot
+from app.services.recommendation_engine import RecommendationEngine
+
+OUT_DIR = Path("data/benchmarks")
+
+# (lat, lng, weight): rough population centres so density looks like a real country
+CITIES = [
+    (52.5200, 13.4050, 0.20),  # Berlin
+    (53.5511, 9.9937, 0.12),   # Hamburg
+    (48.1351, 11.5820, 0.11),  # Munich
+    (50.9375, 6.9603, 0.08),   # Cologne
+    (50.1109, 8.6821, 0.06),   # Frankfurt
+    (48.7758, 9.1829, 0.05),   # Stuttgart
+    (51.2277, 6.7735, 0.05),   # Duesseldorf
+    (51.3397, 12.3731, 0.04),  # Leipzig
+    (51.5136, 7.4653, 0.04),   # Dortmund
+    (51.0504, 13.7373, 0.04),  # Dresden
+]
+RURAL_SHARE = 0.17
+BBOX = (47.3, 55.0, 5.9, 15.0)  # Germany
+
+SERVICE_TYPES = [("car_wash", 0.55), ("maintenance", 0.45)]
+HOURS = [("07:00", "22:00"), ("08:00", "20:00"), ("09:00", "18:00"), ("10:00", "02:00"), ("00:00", "00:00")]
+
+
+def _point(rng: random.Random) -> tuple[float, float]:
+    if rng.random() < RURAL_SHARE:
+        return rng.uniform(BBOX[0], BBOX[1]), rng.uniform(BBOX[2], BBOX[3])
+    lat, lng, _ = rng.choices(CITIES, weights=[c[2] for c in CITIES])[0]
+    return rng.gauss(lat, 0.08), rng.gauss(lng, 0.12)
+
+
+def synthetic_catalog(n: int, seed: int = 7) -> List[ServiceModel]:
+    rng = random.Random(seed)
+    types = [t for t, _ in SERVICE_TYPES]
+    weights = [w for _, w in SERVICE_TYPES]
+    services: List[ServiceModel] = []
+
+    for i in range(n):
+        lat, lng = _point(rng)
+        open_, close = rng.choice(HOURS)
+        weekly = None
+        if rng.random() < 0.2:
+            weekly = {d: [(open_, close)] for d in ("mon", "tue", "wed", "thu", "fri")}
+            weekly["sat"] = [("10:00", "14:00")]
+        services.append(
+            ServiceModel(
+                id=i + 1,
+                name=f"svc-{i + 1}",
+                lat=lat,
+                lng=lng,
+                rating=round(min(5.0, max(1.0, rng.gauss(4.1, 0.5))), 1),
+                type=rng.choices(types, weights=weights)[0],
+                open=open_,
+                close=close,
+                weekly_hours=weekly,
+            )
+        )
+    return services
+
+
+def synthetic_queries(n: int, seed: int = 11) -> List[tuple[float, float, str]]:
+    rng = random.Random(seed)
+    return [(*_point(rng), rng.choice([t for t, _ in SERVICE_TYPES])) for _ in range(n)]
+
+
+def _measure(fn: Callable[[Any], Any], inputs: List[Any]) -> Dict[str, float]:
+    latencies = np.empty(len(inputs))
+    fn(inputs[0])  # warm-up: model load / lazy imports are not per-request cost
+
+    # timed pass with tracing off: tracemalloc hooks every allocation and would skew latency
+    t0 = time.perf_counter()
+    for i, x in enumerate(inputs):
+        s = time.perf_counter()
+        fn(x)
+        latencies[i] = time.perf_counter() - s
+    wall = time.perf_counter() - t0
+
+    # separate pass for peak memory
+    tracemalloc.start()
+    for x in inputs:
+        fn(x)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "mean_ms": float(latencies.mean() * 1000),
+        "throughput_qps": float(len(inputs) / wall) if wall > 0 else 0.0,
+        "peak_mem_mb": peak / 1e6,
+    }
+
+
+def _build(services: List[ServiceModel], config: FeatureConfig, columnar: bool) -> tuple[RecommendationEngine, Dict[str, float]]:
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    engine = RecommendationEngine(services, config=config, columnar=columnar)
+    build_s = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return engine, {"build_s": build_s, "build_peak_mem_mb": peak / 1e6}
+
+
+def run_size(n: int, queries: int, modes: List[str], seed: int) -> Dict[str, Any]:
+    config = FeatureConfig()
+    t0 = time.perf_counter()
+    services = synthetic_catalog(n, seed)
+    gen_s = time.perf_counter() - t0
+    qs = synthetic_queries(queries, seed + 1)
+    clock = ClockSnapshot.take()
+
+    out: Dict[str, Any] = {"catalog_size": n, "queries": queries, "generate_s": gen_s, "results": {}}
+
+    for mode in modes:
+        engine, build = _build(services, config, columnar=(mode == "columnar"))
+
+        rules = _measure(lambda q: engine.recommend_with_features(q[0], q[1], q[2], clock), qs)
+
+        def ml(q):
+            results, feats = engine.recommend_with_features(q[0], q[1], q[2], clock)
+            return score_services_ml(results, feats, hour=clock.now.hour, dayofweek=clock.now.weekday())
+
+        out["results"][mode] = {**build, "rules": rules, "ml": _measure(ml, qs)}
+
+    # FeatureBuilder alone, over every candidate of one dense query
+    builder = FeatureBuilder(config)
+    candidates = [ServiceResult(s, distance_km=1.0, is_available=True) for s in services[: min(n, 100_000)]]
+    fb = _measure(builder.build, candidates)
+    out["results"]["feature_builder"] = {**fb, "rows": len(candidates)}
+
+    return out
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--modes", nargs="+", default=["python", "columnar"], choices=["python", "columnar"])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", type=Path, default=None)
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "runs": [],
+    }
+
+    for n in args.sizes:
+        run = run_size(n, args.queries, args.modes, args.seed)
+        report["runs"].append(run)
+        for mode, r in run["results"].items():
+            if mode == "feature_builder":
+                print(f"n={n:>9} feature_builder   p50={r['p50_ms']:.4f}ms  rows={r['rows']}")
+                continue
+            for path in ("rules", "ml"):
+                m = r[path]
+                print(
+                    f"n={n:>9} {mode:<9} {path:<5}  p50={m['p50_ms']:.3f}ms  p99={m['p99_ms']:.3f}ms  "
+                    f"qps={m['throughput_qps']:.0f}  peak={m['peak_mem_mb']:.1f}MB  build={r['build_s']:.2f}s"
+                )
+
+    out_path = args.out or OUT_DIR / f"reco_bench_{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json"
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    out_path.write_text(json.dumps(report, indent=2))
+    print(f"✅ Wrote: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
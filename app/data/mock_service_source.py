@@ -1,9 +1,21 @@
-from typing import List
+import hashlib
+from typing import List, Optional
 from app.data.mock_services import MOCK_SERVICES
 from app.models.service_model import ServiceModel
 from app.data.service_source import ServiceSource
 
+# every field that changes recommendations: schedule / holiday edits must trigger a reload too
+CATALOG_VERSION_FIELDS = {"id", "name", "lat", "lng", "rating", "type", "open", "close", "weekly_hours", "holidays"}
+
+
 class MockServiceSource(ServiceSource):
 
     def load_services(self) -> List[ServiceModel]:
         return MOCK_SERVICES
+
+    def catalog_version(self) -> Optional[str]:
+        # the mock list is tiny, so a content hash is cheap enough to poll
+        h = hashlib.sha1()
+        for s in MOCK_SERVICES:
+            h.update(s.model_dump_json(include=CATALOG_VERSION_FIELDS).encode())
+        return h.hexdigest()[:12]
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import List, Optional
 from app.models.service_model import ServiceModel
 
 class ServiceSource(ABC):
@@ -8,3 +8,10 @@ class ServiceSource(ABC):
     def load_services(self) -> List[ServiceModel]:
         """Return a list of ServiceModel objects"""
         pass
+
+    def catalog_version(self) -> Optional[str]:
+        """
+        Cheap change marker (etag, mtime, row version...).
+        The catalog is reloaded whenever this value changes; None means "never changes".
+        """
+        return None
@@ -1,29 +1,43 @@
 # app/features/feature_builder.py
 from __future__ import annotations
 
+from typing import Optional
+
 from app.features.feature_config import FeatureConfig
 from app.features.normalizer import FeatureNormalizer
 from app.models.service_model import ServiceModel
+from app.models.service_result import ServiceResult
 
 class FeatureBuilder:
     """
-    Turns a ServiceModel into numeric features for scoring (and later ML training).
+    Turns a ServiceResult view into numeric features for scoring (and later ML training).
     """
 
     def __init__(self, config: FeatureConfig):
         self.config = config
 
-    def build(self, service: ServiceModel) -> dict[str, float]:
+    def static_features(self, service: ServiceModel) -> dict[str, float]:
+        """
+        Features that depend only on the catalog + config (precomputed by StaticFeatureStore).
+        """
+        return {
+            "rating_norm": FeatureNormalizer.min_max(
+                service.rating,
+                self.config.min_rating,
+                self.config.max_rating
+            ),
+        }
+
+    def build(self, service: ServiceResult, static: Optional[dict[str, float]] = None) -> dict[str, float]:
         """
         Requires the engine to have already computed:
           - service.distance_km
           - service.is_available
+        `static` is the service's StaticFeatureStore entry; computed here if not given.
         """
-        rating_norm = FeatureNormalizer.min_max(
-            service.rating,
-            self.config.min_rating,
-            self.config.max_rating
-        )
+        if static is None:
+            static = self.static_features(service)
+        rating_norm = static["rating_norm"]
 
         distance_closeness = FeatureNormalizer.distance_to_score(
             service.distance_km or self.config.max_distance_km,
@@ -0,0 +1,96 @@
+# app/features/feature_store.py
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+import numpy as np
+
+from app.features.feature_builder import FeatureBuilder
+from app.features.feature_config import FeatureConfig
+from app.models.service_model import ServiceModel
+
+# a few (catalog version, config) generations: current one + ones still used by in-flight requests
+MAX_STORES = 4
+
+
+def config_hash(config: FeatureConfig) -> str:
+    return hashlib.sha1(config.model_dump_json().encode("utf-8")).hexdigest()[:12]
+
+
+class StaticFeatureStore:
+    """
+    Request-independent features per service (FeatureBuilder.static_features), computed once
+    for a (catalog version, FeatureConfig hash). Per request only distance / open-now
+    (and hour / weekday for ML) are computed. Used online by RecommendationEngine and
+    offline by build_dataset, so both read the same values.
+    """
+
+    def __init__(
+        self,
+        services: Iterable[ServiceModel],
+        config: FeatureConfig,
+        catalog_version: Optional[str] = None,
+    ):
+        self.config = config
+        self.catalog_version = catalog_version or "static"
+        self.config_hash = config_hash(config)
+
+        builder = FeatureBuilder(config)
+        self._features: dict[int, dict[str, float]] = {
+            s.id: builder.static_features(s) for s in services
+        }
+
+    @property
+    def key(self) -> tuple[str, str]:
+        return self.catalog_version, self.config_hash
+
+    def __len__(self) -> int:
+        return len(self._features)
+
+    def __contains__(self, service_id: int) -> bool:
+        return service_id in self._features
+
+    def get(self, service_id: int) -> Optional[dict[str, float]]:
+        return self._features.get(service_id)
+
+    def column(self, name: str, service_ids: Iterable[int]) -> np.ndarray:
+        """One feature for many services, NaN where a service isn't in the store."""
+        nan = float("nan")
+        return np.array(
+            [self._features.get(sid, {}).get(name, nan) for sid in service_ids], dtype=np.float64
+        )
+
+
+_stores: OrderedDict[tuple[str, str], StaticFeatureStore] = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_feature_store(
+    services: list[ServiceModel],
+    config: FeatureConfig,
+    catalog_version: Optional[str] = None,
+) -> StaticFeatureStore:
+    """
+    Shared store for a versioned catalog; unversioned catalogs get a private one
+    (there is no key that says two of them hold the same services).
+    """
+    if catalog_version is None:
+        return StaticFeatureStore(services, config)
+
+    key = (catalog_version, config_hash(config))
+    with _lock:
+        store = _stores.get(key)
+        if store is not None and all(s.id in store for s in services):
+            _stores.move_to_end(key)
+            return store
+
+    store = StaticFeatureStore(services, config, catalog_version)
+    with _lock:
+        _stores[key] = store
+        _stores.move_to_end(key)
+        while len(_stores) > MAX_STORES:
+            _stores.popitem(last=False)
+    return store
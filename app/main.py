@@ -1,9 +1,37 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from app.routes import translate, recommend, spare_parts, compatibility, obd ,maintenance ,alerts ,offers
+from app.data.mock_service_source import MockServiceSource
+from app.services.catalog_manager import CatalogManager
+from app.services.ml_model_registry import get_model_registry
+from app.services.shadow_scorer import RECO_SHADOW_ML, get_shadow_scorer
 import uvicorn
 
 
-app = FastAPI(title="AutoOne AI Layer")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # one long-lived engine per worker; reloaded in the background when the catalog changes
+    catalog = CatalogManager(MockServiceSource())
+    catalog.start()
+    app.state.catalog = catalog
+
+    # ranker artifact: loaded at startup, hot-swapped when a new version is deployed
+    models = get_model_registry()
+    models.start()
+
+    # optional: score rules traffic with the ML model in the background, for offline comparison
+    shadow = get_shadow_scorer()
+    if RECO_SHADOW_ML:
+        shadow.start()
+
+    yield
+    shadow.stop()
+    await models.stop()
+    await catalog.stop()
+
+
+app = FastAPI(title="AutoOne AI Layer", lifespan=lifespan)
 
 # health check (good for testing if app is running)
 @app.get("/healthz")
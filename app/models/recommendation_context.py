@@ -14,6 +14,8 @@ class RecommendationContext:
     request_time: datetime
     user_id: Optional[str] = None
     ranking_mode: Optional[str] = None  # ✅ NEW ("rules", "ml", "rules_fallback")
+    model_version: Optional[str] = None  # ranker artifact version when ranking_mode == "ml"
+    feature_store_key: Optional[str] = None  # "catalog_version|config_hash" the features came from
 
     def to_dict(self) -> dict:
         return {
@@ -24,4 +26,6 @@ class RecommendationContext:
             "request_time": self.request_time.isoformat(),
             "user_id": self.user_id,
             "ranking_mode": self.ranking_mode,  # ✅ NEW
+            "model_version": self.model_version,
+            "feature_store_key": self.feature_store_key,
         }
\ No newline at end of file
@@ -11,8 +11,9 @@
 #     open: str
 #     close: str
     
+from datetime import date
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
 class ServiceModel(BaseModel):
     id: int
@@ -24,14 +25,16 @@ class ServiceModel(BaseModel):
     open: str
     close: str
 
+    # Optional per-weekday schedule, e.g. {"sat": [("10:00", "14:00")], "sun": []}.
+    # When set it replaces open/close; close <= open means overnight.
+    weekly_hours: Optional[Dict[str, List[Tuple[str, str]]]] = None
+    holidays: List[date] = []
 
-    # Computed fields (we add them during recommendation)
-    distance_km: Optional[float] = None
-    is_available: Optional[bool] = None
-    status: Optional[str] = None
-    score: Optional[float] = None
+    # Catalog objects are shared across requests and read-only.
+    # Computed fields (distance_km, is_available, status, score) live in ServiceResult.
 
     class Config:
         extra = "allow"
+        frozen = True
         
     
\ No newline at end of file
@@ -0,0 +1,37 @@
+# app/models/service_result.py
+from __future__ import annotations
+
+from typing import Any, Dict, NamedTuple, Optional
+
+from app.models.service_model import ServiceModel
+
+
+RESPONSE_EXCLUDE = {"weekly_hours", "holidays"}
+
+
+class ServiceResult(NamedTuple):
+    """
+    Per-request view over a read-only catalog ServiceModel.
+    Holds the computed fields so concurrent requests never write to shared catalog objects.
+    Catalog attributes (id, name, rating, ...) are read through from the wrapped service.
+    """
+    service: ServiceModel
+    distance_km: Optional[float] = None
+    is_available: Optional[bool] = None
+    status: Optional[str] = None
+    score: Optional[float] = None
+    ml_score: Optional[float] = None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.service, name)
+
+    def to_dict(self, include_ml_score: bool = False) -> Dict[str, Any]:
+        # schedule fields are for scoring only; the response keeps its original shape
+        out = self.service.model_dump(exclude=RESPONSE_EXCLUDE)
+        out["distance_km"] = self.distance_km
+        out["is_available"] = self.is_available
+        out["status"] = self.status
+        out["score"] = self.score
+        if include_ml_score:
+            out["ml_score"] = self.ml_score
+        return out
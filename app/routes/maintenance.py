@@ -1,11 +1,9 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import Optional
 
 from app.services.predictive_maintenance import PredictiveMaintenanceService
-from app.data.mock_service_source import MockServiceSource
-from app.services.recommendation_engine import RecommendationEngine
-from app.features.feature_config import FeatureConfig
+from app.services.catalog_manager import CatalogSnapshot, get_catalog_snapshot
 
 router = APIRouter()
 service = PredictiveMaintenanceService()
@@ -34,7 +32,10 @@ async def predict_maintenance(req: MaintenanceRequest):
 
 
 @router.post("/maintenance/recommend")
-async def recommend_maintenance(req: MaintenanceRecommendRequest):
+async def recommend_maintenance(
+    req: MaintenanceRecommendRequest,
+    catalog: CatalogSnapshot = Depends(get_catalog_snapshot),
+):
     try:
         # 1) predict issue
         prediction = service.predict(req.vin, req.code)
@@ -43,19 +44,11 @@ async def recommend_maintenance(req: MaintenanceRecommendRequest):
         lat = req.lat if req.lat is not None else 52.5200
         lng = req.lng if req.lng is not None else 13.4050
 
-        source = MockServiceSource()
-        services = source.load_services()
-
-        engine = RecommendationEngine(
-            services=services,
-            config=FeatureConfig()
-        )
-
-        recommendations = engine.recommend(lat, lng, "maintenance")
+        recommendations = catalog.engine.recommend(lat, lng, "maintenance")
 
         return {
             "prediction": prediction,
-            "recommendations": recommendations
+            "recommendations": [r.to_dict() for r in recommendations]
         }
 
     except Exception as e:
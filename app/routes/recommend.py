@@ -149,19 +149,21 @@
 
 
 # app/routes/recommend.py
+import asyncio
 import uuid
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
 
-from app.data.mock_service_source import MockServiceSource
-from app.features.feature_config import FeatureConfig
 from app.models.recommendation_context import RecommendationContext
-from app.services.ml_ranker import score_services_ml
-from app.services.recommendation_engine import RecommendationEngine
+from app.services.catalog_manager import CatalogSnapshot, get_catalog_snapshot
+from app.services.ml_batcher import get_ml_batcher
+from app.services.ml_model_registry import get_model_registry
+from app.services.opening_hours import ClockSnapshot
 from app.services.recommendation_event_logger import RecommendationEventLogger
+from app.services.shadow_scorer import get_shadow_scorer
 
 router = APIRouter()
 logger = RecommendationEventLogger()
@@ -175,16 +177,14 @@ class RecommendRequest(BaseModel):
 
 
 @router.post("/recommend")
-async def recommend(req: RecommendRequest):
+async def recommend(
+    req: RecommendRequest,
+    catalog: CatalogSnapshot = Depends(get_catalog_snapshot),
+):
     try:
         lat = req.lat if req.lat is not None else 52.5200
         lng = req.lng if req.lng is not None else 13.4050
 
-        source = MockServiceSource()
-        services = source.load_services()
-
-        engine = RecommendationEngine(services=services, config=FeatureConfig())
-
         request_id = str(uuid.uuid4())
         now = datetime.utcnow()
 
@@ -196,17 +196,19 @@ async def recommend(req: RecommendRequest):
             request_time=now,
             user_id=req.user_id,
             ranking_mode="rules",   # ✅ NEW
-
+            feature_store_key=catalog.feature_store_key,
         )
 
-        results, feats = engine.recommend_with_features(lat, lng, req.service)
+        # off the event loop: a sharded engine waits on its shard processes
+        results, feats = await asyncio.to_thread(catalog.recommend_cached, lat, lng, req.service)
 
         logger.log_impression(context, results, feats)
+        get_shadow_scorer().submit(request_id, req.service, now, results, feats)  # no-op unless enabled
 
         if not results:
             return {"request_id": request_id, "message": f"No services found for type '{req.service}'"}
 
-        return {"request_id": request_id, "recommendations": results}
+        return {"request_id": request_id, "recommendations": [s.to_dict() for s in results]}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -266,29 +268,34 @@ async def recommend(req: RecommendRequest):
 
 
 @router.post("/recommend_ml")
-async def recommend_ml(req: RecommendRequest):
+async def recommend_ml(
+    req: RecommendRequest,
+    catalog: CatalogSnapshot = Depends(get_catalog_snapshot),
+):
     try:
         lat = req.lat if req.lat is not None else 52.5200
         lng = req.lng if req.lng is not None else 13.4050
 
-        source = MockServiceSource()
-        services = source.load_services()
-
-        engine = RecommendationEngine(services=services, config=FeatureConfig())
+        engine = catalog.engine
 
         request_id = str(uuid.uuid4())
         now = datetime.utcnow()
 
-        # Get candidates + features first
-        results, feats = engine.recommend_with_features(lat, lng, req.service)
-
-        # Try ML scoring
-        ml_scores = score_services_ml(
-            services=results,
-            features_by_id=feats,
-            hour=now.hour,
-            dayofweek=now.weekday(),
-        )
+        # Get candidates + features first (off the event loop, like /recommend)
+        results, feats = await asyncio.to_thread(engine.recommend_with_features, lat, lng, req.service)
+
+        # Try ML scoring, pinned to one model version (a hot swap can't split the request)
+        # (micro-batched with concurrent requests into one vectorised call)
+        active_model = get_model_registry().active()
+        ml_scores = {}
+        if active_model is not None:
+            ml_scores = await get_ml_batcher().score(
+                services=results,
+                features_by_id=feats,
+                hour=now.hour,
+                dayofweek=now.weekday(),
+                artifact=active_model.artifact,
+            )
 
         # ✅ Decide whether ML really worked
         ranking_mode = "ml" if ml_scores else "rules_fallback"
@@ -302,12 +309,13 @@ async def recommend_ml(req: RecommendRequest):
             request_time=now,
             user_id=req.user_id,
             ranking_mode=ranking_mode,   # make sure this field exists in RecommendationContext
+            model_version=active_model.version if ml_scores else None,
+            feature_store_key=catalog.feature_store_key,
         )
 
         # ✅ If ML works, sort by ml_score
         if ml_scores:
-            for s in results:
-                s.ml_score = ml_scores.get(s.id, 0.0)
+            results = [s._replace(ml_score=ml_scores.get(s.id, 0.0)) for s in results]
 
             results.sort(
                 key=lambda x: (not x.is_available, -(x.ml_score or 0.0))
@@ -315,9 +323,6 @@ async def recommend_ml(req: RecommendRequest):
 
         # ✅ If ML fails, fall back to rule score
         else:
-            for s in results:
-                s.ml_score = None
-
             results.sort(
                 key=lambda x: (not x.is_available, -(x.score or 0.0))
             )
@@ -332,12 +337,79 @@ async def recommend_ml(req: RecommendRequest):
 
         return {
             "request_id": request_id,
-            "recommendations": results
+            "recommendations": [s.to_dict(include_ml_score=True) for s in results]
         }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class BatchRecommendRequest(BaseModel):
+    queries: List[RecommendRequest] = Field(min_length=1, max_length=500)
+
+
+@router.post("/recommend/batch")
+async def recommend_batch(
+    req: BatchRecommendRequest,
+    catalog: CatalogSnapshot = Depends(get_catalog_snapshot),
+):
+    try:
+        now = datetime.utcnow()
+        clock = ClockSnapshot.take()
+
+        coords = [
+            (
+                q.lat if q.lat is not None else 52.5200,
+                q.lng if q.lng is not None else 13.4050,
+                q.service,
+            )
+            for q in req.queries
+        ]
+
+        # one pass over the catalog for all queries, one clock reading
+        batch = await asyncio.to_thread(catalog.engine.recommend_batch, coords, clock)
+
+        to_log = []
+        out = []
+        for q, (lat, lng, service), (results, feats) in zip(req.queries, coords, batch):
+            request_id = str(uuid.uuid4())
+            context = RecommendationContext(
+                request_id=request_id,
+                service_type=service,
+                user_lat=lat,
+                user_lng=lng,
+                request_time=now,
+                user_id=q.user_id,
+                ranking_mode="rules",
+                feature_store_key=catalog.feature_store_key,
+            )
+            to_log.append((context, results, feats))
+
+            if not results:
+                out.append({"request_id": request_id, "message": f"No services found for type '{service}'"})
+            else:
+                out.append({"request_id": request_id, "recommendations": [s.to_dict() for s in results]})
+
+        logger.log_impressions(to_log)
+
+        return {"results": out}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/recommend_ml/model")
+async def recommend_ml_model():
+    active_model = get_model_registry().active()
+    if active_model is None:
+        return {"version": None}
+    return {
+        "version": active_model.version,
+        "path": str(active_model.path),
+        "loaded_at": active_model.loaded_at.isoformat(),
+        "feature_cols": list(active_model.artifact.get("feature_cols", [])),
+    }
+
+
 class ClickRequest(BaseModel):
     request_id: str
     service: str
@@ -3,7 +3,7 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 from typing import Optional
 from app.data.mock_spare_parts import MOCK_SPARE_PARTS
-from app.search.search_engine import SparePartSearchEngine
+from app.search.search_engine import SparePartSearchEngine, rank_key
 from app.services.parts_event_logger import PartsEventLogger
 from app.search.filters import apply_filters, paginate
 from app.vin.vin_decoder import MockVinDecoder, is_valid_vin
@@ -45,7 +45,7 @@ async def search_spare_parts(req: SearchRequest):
     try:
         request_id = str(uuid.uuid4())
         # results = engine.search(req.query, limit=req.limit)
-        candidates = engine.search(req.query)  # ✅ remove limit here
+        candidates = engine.match(req.query)  # unsorted; paginate() ranks only what it returns
 
 
 
@@ -64,6 +64,7 @@ async def search_spare_parts(req: SearchRequest):
             filtered,
             page=req.page,
             page_size=req.page_size,
+            key=rank_key,
         )
 
         # log impression (log only page items OR all filtered—your choice)
@@ -161,7 +162,7 @@ async def search_spare_parts_by_vin(req: VinSearchRequest):
         vehicle: VehicleProfile = vin_decoder.decode(vin)
 
         # 1) keyword search
-        candidates = engine.search(req.query or "")
+        candidates = engine.match(req.query or "")
 
         # 2) vehicle-based filtering (only if your parts have car_make/car_model)
         filtered_vehicle = candidates
@@ -194,6 +195,7 @@ async def search_spare_parts_by_vin(req: VinSearchRequest):
             filtered,
             page=req.page,
             page_size=req.page_size,
+            key=rank_key,
         )
         enriched_results = []
         for p in page_items:
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 from math import ceil
-from typing import Iterable, Optional, Tuple, List
+from typing import Any, Callable, Iterable, Optional, Tuple, List
 
 from app.models.spare_part_model import SparePartModel
+from app.services.ranking import top_k
 
 
 def apply_filters(
@@ -38,7 +39,16 @@ def apply_filters(
 
 
 
-def paginate(items: List[SparePartModel], *, page: int, page_size: int) -> Tuple[List[SparePartModel], int, int, int]:
+def paginate(
+    items: List[SparePartModel],
+    *,
+    page: int,
+    page_size: int,
+    key: Optional[Callable[[SparePartModel], Any]] = None,
+) -> Tuple[List[SparePartModel], int, int, int]:
+    """
+    With key, items may be unsorted: only the first page*page_size ranks are selected (top-k).
+    """
     total = len(items)
     total_pages = max(1, ceil(total / page_size))
 
@@ -46,6 +56,9 @@ def paginate(items: List[SparePartModel], *, page: int, page_size: int) -> Tuple
     start = (page - 1) * page_size
     end = start + page_size
 
+    if key is not None:
+        items = top_k(items, end, key=key)
+
     return items[start:end], total, total_pages, page
 
     
\ No newline at end of file
@@ -3,14 +3,21 @@ from typing import List,Optional
 from app.search.tokenizer import tokenize
 from app.search.text_matcher import TextMatcher
 from app.models.spare_part_model import SparePartModel
+from app.services.ranking import top_k
+
+
+def rank_key(part: SparePartModel) -> float:
+    """Higher text score first; ties keep catalog order."""
+    return -(part.score or 0.0)
+
 
 class SparePartSearchEngine:
 
     def __init__(self, parts: List[SparePartModel]):
         self.parts = parts
 
-    def search(self, query: str,limit: Optional[int] = None) -> List[SparePartModel]:
-
+    def match(self, query: str) -> List[SparePartModel]:
+        """Scored matches in catalog order (unsorted); rank with rank_key."""
         tokens = tokenize(query)
 
         scored = []
@@ -19,9 +26,10 @@ class SparePartSearchEngine:
             if s > 0:
                 part.score = s
                 scored.append(part)
+        return scored
 
-        scored.sort(key=lambda x: x.score, reverse=True)
-        return scored[:limit]
+    def search(self, query: str,limit: Optional[int] = None) -> List[SparePartModel]:
+        return top_k(self.match(query), limit, key=rank_key)
 
 
 
@@ -1,23 +1,24 @@
-from datetime import datetime
+from __future__ import annotations
 
-class AvailabilityChecker:
-
-    @staticmethod
-    def is_open_now(service, distance_km):
-        now = datetime.now().time()
+from typing import Optional
 
-        open_time = datetime.strptime(service.open, "%H:%M").time()
-        close_time = datetime.strptime(service.close, "%H:%M").time()
+from app.services.opening_hours import ClockSnapshot, OpeningHours
 
-        if now < open_time or now > close_time:
-            return False, "closed"
-
-        travel_minutes = (distance_km / 30) * 60  
-        latest_arrival = (datetime.combine(datetime.today(), close_time)
-                          .timestamp() - 20*60)
-        arrival_time = datetime.now().timestamp() + travel_minutes*60
+class AvailabilityChecker:
 
-        if arrival_time <= latest_arrival:
-            return True, "open"
-        else:
-            return False, "closing_soon"
\ No newline at end of file
+    @staticmethod
+    def is_open_now(
+        service,
+        distance_km,
+        clock: Optional[ClockSnapshot] = None,
+        hours: Optional[OpeningHours] = None,
+    ):
+        """
+        Open now and reachable 20 min before closing.
+        Pass precompiled hours and the request's clock snapshot to skip parsing and extra clock reads.
+        """
+        if hours is None:
+            hours = OpeningHours.compile(service)
+        if clock is None:
+            clock = ClockSnapshot.take()
+        return hours.status(clock, distance_km)
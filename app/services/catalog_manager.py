@@ -0,0 +1,166 @@
+# app/services/catalog_manager.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Optional, Union
+
+from fastapi import Request
+
+from app.data.service_source import ServiceSource
+from app.features.feature_config import FeatureConfig
+from app.features.feature_store import config_hash
+from app.models.service_model import ServiceModel
+from app.services.recommendation_cache import RecommendationCache
+from app.services.recommendation_engine import RecommendationEngine
+from app.services.sharded_engine import ShardedRecommendationEngine
+
+log = logging.getLogger(__name__)
+
+CATALOG_POLL_SECONDS = float(os.getenv("CATALOG_POLL_SECONDS", "30"))
+# >1 scores in that many geographic shard processes (country-scale catalogs)
+RECO_SHARDS = int(os.getenv("RECO_SHARDS", "1"))
+# NumPy scoring (ColumnarCatalog): same results as the per-service path, and the batch endpoint
+# scans each service type once per batch instead of once per query. "0" keeps the Python path.
+RECO_COLUMNAR = os.getenv("RECO_COLUMNAR", "1") == "1"
+# how long a replaced sharded engine keeps its processes for in-flight requests
+ENGINE_RETIRE_SECONDS = float(os.getenv("ENGINE_RETIRE_SECONDS", "30"))
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """
+    One loaded version of the catalog and the engine built from it.
+    Requests grab a snapshot once and keep using it even if a reload swaps in a newer one.
+    """
+    version: str
+    services: tuple[ServiceModel, ...]
+    engine: Union[RecommendationEngine, ShardedRecommendationEngine]
+    cache: RecommendationCache
+    loaded_at: datetime = field(default_factory=datetime.utcnow)
+
+    @property
+    def feature_store_key(self) -> str:
+        """Logged with each impression so offline builds know which static features were served."""
+        return f"{self.version}|{config_hash(self.engine.config)}"
+
+    def recommend_cached(self, user_lat: float, user_lng: float, service_type: str):
+        """Rules-mode recommendation through the shared geo-quantized result cache."""
+        return self.cache.recommend(self.engine, self.version, user_lat, user_lng, service_type)
+
+
+class CatalogManager:
+    """
+    Process-lifetime owner of the RecommendationEngine.
+    Created in the FastAPI lifespan; polls ServiceSource.catalog_version() in the background
+    and rebuilds the engine off the event loop when it changes.
+    """
+
+    def __init__(
+        self,
+        source: ServiceSource,
+        config: FeatureConfig | None = None,
+        poll_seconds: float = CATALOG_POLL_SECONDS,
+        engine_kwargs: Optional[Dict[str, Any]] = None,
+        cache: Optional[RecommendationCache] = None,
+        shards: int = RECO_SHARDS,
+    ):
+        self.source = source
+        self.config = config or FeatureConfig()
+        self.poll_seconds = poll_seconds
+        self.engine_kwargs = {"columnar": RECO_COLUMNAR, **(engine_kwargs or {})}
+        # shared across snapshots; keys carry the catalog version, old entries age out via LRU
+        self.cache = cache or RecommendationCache()
+        self.shards = shards
+
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._reload_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def snapshot(self) -> CatalogSnapshot:
+        snap = self._snapshot  # single read -> consistent view for the whole request
+        if snap is None:
+            snap = self.reload()
+        return snap
+
+    @property
+    def version(self) -> Optional[str]:
+        snap = self._snapshot
+        return snap.version if snap else None
+
+    def reload(self, version: Optional[str] = None) -> CatalogSnapshot:
+        with self._reload_lock:
+            if version is None:
+                version = self.source.catalog_version() or "static"
+            services = tuple(self.source.load_services())
+            engine = self._build_engine(list(services), version)
+            snap = CatalogSnapshot(version=version, services=services, engine=engine, cache=self.cache)
+            old, self._snapshot = self._snapshot, snap  # atomic swap
+            log.info("catalog loaded: version=%s services=%d", version, len(services))
+            if old is not None:
+                self._retire(old.engine)
+            return snap
+
+    def _build_engine(self, services: list[ServiceModel], version: str):
+        # the version keys the static feature store, so it is shared with build_dataset
+        engine_kwargs = {**self.engine_kwargs, "catalog_version": version}
+        if self.shards > 1:
+            return ShardedRecommendationEngine(
+                services, config=self.config, shards=self.shards, engine_kwargs=engine_kwargs
+            )
+        return RecommendationEngine(services, config=self.config, **engine_kwargs)
+
+    @staticmethod
+    def _retire(engine, delay: float = ENGINE_RETIRE_SECONDS) -> None:
+        close = getattr(engine, "close", None)
+        if close is None:
+            return
+        timer = threading.Timer(delay, close)
+        timer.daemon = True
+        timer.start()
+
+    def refresh_if_changed(self) -> bool:
+        current = self._snapshot
+        version = self.source.catalog_version()
+        if current is not None and (version is None or version == current.version):
+            return False
+        self.reload(version)
+        return True
+
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await asyncio.to_thread(self.refresh_if_changed)
+            except Exception:
+                # keep serving the last good snapshot
+                log.exception("catalog reload failed")
+
+    def start(self) -> None:
+        if self._snapshot is None:
+            self.reload()
+        if self._task is None and self.poll_seconds > 0:
+            self._task = asyncio.get_running_loop().create_task(self._poll())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        snap = self._snapshot
+        close = getattr(snap.engine, "close", None) if snap else None
+        if close is not None:
+            await asyncio.to_thread(close)
+
+
+def get_catalog_snapshot(request: Request) -> CatalogSnapshot:
+    """FastAPI dependency: the worker's current catalog snapshot."""
+    return request.app.state.catalog.snapshot()
@@ -0,0 +1,191 @@
+# app/services/columnar_catalog.py
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Optional, Sequence
+
+import numpy as np
+
+from app.features.feature_config import FeatureConfig
+from app.features.feature_store import StaticFeatureStore
+from app.models.service_model import ServiceModel
+from app.models.service_result import ServiceResult
+from app.services.opening_hours import ClockSnapshot, OpeningHoursIndex
+from app.services.ranking import top_k_indices
+from app.services.spatial_index import KM_PER_DEG_LAT
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_np(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """
+    Vectorised DistanceCalculator.haversine: one user point vs. many services.
+    """
+    phi1 = np.radians(lat)
+    phi2 = np.radians(lats)
+    dphi = phi2 - phi1
+    dlambda = np.radians(lngs - lng)
+
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+class _TypeColumns:
+    def __init__(self, services: list[ServiceModel], store: Optional[StaticFeatureStore] = None):
+        self.services = services
+        self.ids = np.array([s.id for s in services], dtype=np.int64)
+        self.lat = np.array([s.lat for s in services], dtype=np.float64)
+        self.lng = np.array([s.lng for s in services], dtype=np.float64)
+        self.rating = np.array([s.rating for s in services], dtype=np.float64)
+        self.hours = OpeningHoursIndex(services)
+        # precomputed for store.config; None -> computed from rating per request
+        self.rating_norm = store.column("rating_norm", (s.id for s in services)) if store else None
+
+
+class ColumnarCatalog:
+    """
+    Holds lat/lng/rating and compiled opening hours as NumPy arrays per service type, so a request
+    scores every candidate in a few array operations instead of per-service Python calls.
+    Only the top rows are turned into ServiceResult views.
+    """
+
+    def __init__(self, services: list[ServiceModel], store: Optional[StaticFeatureStore] = None):
+        by_type: dict[str, list[ServiceModel]] = defaultdict(list)
+        for s in services:
+            by_type[s.type].append(s)
+        self.store = store
+        self._by_type = {t: _TypeColumns(items, store) for t, items in by_type.items()}
+
+    def recommend_with_features(
+        self,
+        user_lat: float,
+        user_lng: float,
+        service_type: str,
+        config: FeatureConfig,
+        clock: Optional[ClockSnapshot] = None,
+    ) -> tuple[list[ServiceResult], dict[int, dict[str, float]]]:
+        return self.recommend_batch([(user_lat, user_lng, service_type)], config, clock)[0]
+
+    def recommend_batch(
+        self,
+        queries: Sequence[tuple[float, float, str]],
+        config: FeatureConfig,
+        clock: Optional[ClockSnapshot] = None,
+    ) -> list[tuple[list[ServiceResult], dict[int, dict[str, float]]]]:
+        """
+        Scores many (lat, lng, service_type) queries against one clock reading.
+        Per service type the catalog is scanned once (union bounding box) and opening hours
+        are evaluated once; each query then only does its own distances and top-k.
+        """
+        clock = clock or ClockSnapshot.take()
+        out: list[tuple[list[ServiceResult], dict[int, dict[str, float]]]] = [([], {}) for _ in queries]
+
+        by_type: dict[str, list[int]] = defaultdict(list)
+        for qi, (_, _, service_type) in enumerate(queries):
+            by_type[service_type].append(qi)
+
+        radius = config.max_distance_km
+        dlat = radius / KM_PER_DEG_LAT
+        use_store = self.store is not None and self.store.config == config
+
+        for service_type, qis in by_type.items():
+            cols = self._by_type.get(service_type)
+            if cols is None:
+                continue
+
+            q_lat = np.array([queries[qi][0] for qi in qis], dtype=np.float64)
+            q_lng = np.array([queries[qi][1] for qi in qis], dtype=np.float64)
+            q_dlng = radius / (
+                KM_PER_DEG_LAT * np.maximum(np.cos(np.radians(np.minimum(np.abs(q_lat) + dlat, 89.0))), 1e-6)
+            )
+
+            # cheap bounding-box prefilter before the trig, one pass for the whole group
+            rows = np.flatnonzero(
+                (cols.lat >= q_lat.min() - dlat) & (cols.lat <= q_lat.max() + dlat)
+                & (cols.lng >= (q_lng - q_dlng).min()) & (cols.lng <= (q_lng + q_dlng).max())
+            )
+            if rows.size == 0:
+                continue
+
+            # same rules as AvailabilityChecker.is_open_now, against one clock reading
+            left = cols.hours.remaining_minutes(clock, rows)
+            sub_lat, sub_lng = cols.lat[rows], cols.lng[rows]
+
+            for j, qi in enumerate(qis):
+                near = np.flatnonzero(
+                    (np.abs(sub_lat - q_lat[j]) <= dlat) & (np.abs(sub_lng - q_lng[j]) <= q_dlng[j])
+                )
+                if near.size == 0:
+                    continue
+                distance = haversine_np(q_lat[j], q_lng[j], sub_lat[near], sub_lng[near])
+                keep = distance <= radius
+                near, distance = near[keep], distance[keep]
+                if near.size == 0:
+                    continue
+                out[qi] = self._rank(cols, rows[near], distance, left[near], config, use_store)
+
+        return out
+
+    @staticmethod
+    def _rank(
+        cols: _TypeColumns,
+        idx: np.ndarray,
+        distance: np.ndarray,
+        left: np.ndarray,
+        config: FeatureConfig,
+        use_store: bool = False,
+    ) -> tuple[list[ServiceResult], dict[int, dict[str, float]]]:
+        distance_km = np.round(distance, 2)
+        is_available, in_hours = OpeningHoursIndex.available_from_remaining(left, distance_km)
+
+        # same normalisation as FeatureBuilder.static_features
+        if use_store:
+            rating_norm = cols.rating_norm[idx]
+        elif config.max_rating <= config.min_rating:
+            rating_norm = np.zeros(idx.size)
+        else:
+            rating_norm = np.clip(
+                (cols.rating[idx] - config.min_rating) / (config.max_rating - config.min_rating), 0.0, 1.0
+            )
+        closeness_input = np.where(distance_km == 0, config.max_distance_km, distance_km)
+        distance_closeness = 1.0 - np.clip(closeness_input, 0.0, config.max_distance_km) / config.max_distance_km
+        open_now = is_available.astype(np.float64)
+
+        score = (
+            rating_norm * config.weight_rating
+            + distance_closeness * config.weight_distance
+            + open_now * config.weight_open_now
+        )
+
+        # open services first, then score, then id (availability_rank_key); only k rows leave NumPy
+        span = np.ptp(score) + 1.0
+        order = top_k_indices(np.where(is_available, 0.0, span) - score, config.max_results, cols.ids[idx])
+
+        top: list[ServiceResult] = []
+        feature_map: dict[int, dict[str, float]] = {}
+        for i in order:
+            s = cols.services[idx[i]]
+            available = bool(is_available[i])
+            if available:
+                status = "open"
+            elif in_hours[i]:
+                status = "closing_soon"
+            else:
+                status = "closed"
+
+            top.append(
+                ServiceResult(
+                    s,
+                    distance_km=float(distance_km[i]),
+                    is_available=available,
+                    status=status,
+                    score=float(score[i]),
+                )
+            )
+            feature_map[s.id] = {
+                "rating_norm": float(rating_norm[i]),
+                "distance_closeness": float(distance_closeness[i]),
+                "open_now": float(open_now[i]),
+            }
+
+        return top, feature_map
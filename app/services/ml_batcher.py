@@ -0,0 +1,112 @@
+# app/services/ml_batcher.py
+from __future__ import annotations
+
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.models.service_result import ServiceResult
+from app.services.ml_ranker import build_feature_matrix, predict_proba_matrix
+
+ML_BATCH_WINDOW_MS = float(os.getenv("ML_BATCH_WINDOW_MS", "2"))
+ML_BATCH_MAX_ROWS = int(os.getenv("ML_BATCH_MAX_ROWS", "1024"))
+
+
+@dataclass
+class _Pending:
+    X: np.ndarray
+    artifact: Dict[str, Any]
+    future: asyncio.Future
+
+
+class MLMicroBatcher:
+    """
+    Collects candidate rows from concurrent /recommend_ml requests for up to window_ms
+    (or until max_rows are waiting), scores them with one vectorised call per model
+    artifact, and hands each request its own slice. The window bounds the added latency.
+    """
+
+    def __init__(self, window_ms: float = ML_BATCH_WINDOW_MS, max_rows: int = ML_BATCH_MAX_ROWS):
+        self.window_s = window_ms / 1000.0
+        self.max_rows = max_rows
+
+        self._pending: List[_Pending] = []
+        self._rows = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self.batches = 0
+        self.rows_scored = 0
+
+    async def score(
+        self,
+        services: List[ServiceResult],
+        features_by_id: Dict[int, Dict[str, float]],
+        hour: int,
+        dayofweek: int,
+        artifact: Optional[Dict[str, Any]],
+    ) -> Dict[int, float]:
+        """Same contract as score_services_ml: {} when there is no model or scoring fails."""
+        if artifact is None or not services:
+            return {}
+
+        try:
+            X = build_feature_matrix(services, features_by_id, hour, dayofweek, artifact["feature_cols"])
+        except Exception:
+            return {}
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(_Pending(X=X, artifact=artifact, future=future))
+        self._rows += len(X)
+
+        if self._rows >= self.max_rows:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_s, self._flush)
+
+        try:
+            proba = await future
+        except Exception:
+            return {}  # ✅ any inference error -> fallback
+        return {s.id: float(p) for s, p in zip(services, proba)}
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        pending, self._pending, self._rows = self._pending, [], 0
+
+        # a model hot swap can land mid-window: score each artifact's rows separately
+        groups: Dict[int, List[_Pending]] = {}
+        for p in pending:
+            groups.setdefault(id(p.artifact), []).append(p)
+
+        for group in groups.values():
+            try:
+                X = np.vstack([p.X for p in group])
+                proba = predict_proba_matrix(group[0].artifact, X)
+            except Exception as e:
+                for p in group:
+                    if not p.future.done():
+                        p.future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.rows_scored += len(X)
+            offset = 0
+            for p in group:
+                n = len(p.X)
+                if not p.future.done():
+                    p.future.set_result(proba[offset:offset + n])
+                offset += n
+
+
+_batcher = MLMicroBatcher()
+
+
+def get_ml_batcher() -> MLMicroBatcher:
+    return _batcher
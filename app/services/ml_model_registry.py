@@ -1,19 +1,159 @@
 from __future__ import annotations
 
+import asyncio
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
-import joblib
+import numpy as np
+
+log = logging.getLogger(__name__)
 
 MODEL_PATH = Path("models/reco_lr.pkl")
+# preferred when present: loads with NumPy only (see model_artifact.py)
+PORTABLE_MODEL_PATH = Path("models/reco_lr.npz")
+# optional; written by train_ranker:
+# {"artifact": "reco_lr.pkl", "portable": "reco_lr.npz", "version": "..."}
+MANIFEST_PATH = Path("models/manifest.json")
+MODEL_POLL_SECONDS = float(os.getenv("MODEL_POLL_SECONDS", "30"))
 
-_cached: Optional[Dict[str, Any]] = None
 
-def get_model_artifact() -> Optional[Dict[str, Any]]:
-    global _cached
-    if _cached is not None:
-        return _cached
-    if not MODEL_PATH.exists():
+def load_artifact(path: Path) -> Dict[str, Any]:
+    if path.suffix == ".npz":
+        from app.services.model_artifact import load_portable
+
+        return load_portable(path)
+
+    import joblib  # pickled sklearn artifacts only; the .npz path never imports it
+
+    return joblib.load(path)
+
+
+@dataclass(frozen=True)
+class ActiveModel:
+    version: str
+    path: Path
+    artifact: Dict[str, Any]
+    loaded_at: datetime = field(default_factory=datetime.utcnow)
+
+
+class ModelRegistry:
+    """
+    Tracks the deployed ranker artifact by version (manifest, or file mtime without one).
+    New versions are loaded in the background, validated with a warm-up prediction and
+    swapped in atomically; a bad artifact is logged and the previous model keeps serving.
+    """
+
+    def __init__(
+        self,
+        model_path: Path = MODEL_PATH,
+        portable_path: Path = PORTABLE_MODEL_PATH,
+        manifest_path: Path = MANIFEST_PATH,
+        poll_seconds: float = MODEL_POLL_SECONDS,
+    ):
+        self.model_path = model_path
+        self.portable_path = portable_path
+        self.manifest_path = manifest_path
+        self.poll_seconds = poll_seconds
+
+        self._active: Optional[ActiveModel] = None
+        self._checked = False
+        self._rejected: Optional[str] = None  # don't retry a bad version every poll
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def _resolve(self) -> Optional[Tuple[Path, str]]:
+        if self.manifest_path.exists():
+            manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+            path = self.manifest_path.parent / (manifest.get("portable") or manifest["artifact"])
+            version = manifest.get("version") or f"{path.name}@{path.stat().st_mtime_ns}"
+            return path, str(version)
+        if self.portable_path.exists():
+            return self.portable_path, f"{self.portable_path.name}@{self.portable_path.stat().st_mtime_ns}"
+        if self.model_path.exists():
+            return self.model_path, f"{self.model_path.name}@{self.model_path.stat().st_mtime_ns}"
         return None
-    _cached = joblib.load(MODEL_PATH)
-    return _cached
+
+    @staticmethod
+    def _validate(artifact: Dict[str, Any]) -> None:
+        from app.services.ml_ranker import predict_proba_matrix  # avoid import cycle
+
+        cols = artifact["feature_cols"]
+        proba = predict_proba_matrix(artifact, np.zeros((2, len(cols))))
+        if proba.shape != (2,) or not np.all(np.isfinite(proba)) or proba.min() < 0 or proba.max() > 1:
+            raise ValueError(f"warm-up prediction returned invalid probabilities: {proba!r}")
+
+    def refresh_if_changed(self) -> bool:
+        with self._lock:
+            self._checked = True
+            resolved = self._resolve()
+            if resolved is None:
+                return False
+            path, version = resolved
+            current = self._active
+            if (current is not None and current.version == version) or version == self._rejected:
+                return False
+
+            try:
+                artifact = load_artifact(path)
+                self._validate(artifact)
+            except Exception:
+                self._rejected = version
+                raise
+            self._active = ActiveModel(version=version, path=path, artifact=artifact)  # atomic swap
+            log.info("ranker model loaded: version=%s path=%s", version, path)
+            return True
+
+    def active(self) -> Optional[ActiveModel]:
+        model = self._active
+        if model is None and not self._checked:
+            try:
+                self.refresh_if_changed()
+            except Exception:
+                log.exception("ranker model load failed")
+            model = self._active
+        return model
+
+    @property
+    def version(self) -> Optional[str]:
+        model = self._active
+        return model.version if model else None
+
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await asyncio.to_thread(self.refresh_if_changed)
+            except Exception:
+                log.exception("ranker model reload failed; keeping version %s", self.version)
+
+    def start(self) -> None:
+        self.active()
+        if self._task is None and self.poll_seconds > 0:
+            self._task = asyncio.get_running_loop().create_task(self._poll())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_registry = ModelRegistry()
+
+
+def get_model_registry() -> ModelRegistry:
+    return _registry
+
+
+def get_model_artifact() -> Optional[Dict[str, Any]]:
+    model = _registry.active()
+    return model.artifact if model else None
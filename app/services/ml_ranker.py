@@ -44,47 +44,124 @@
 
 from __future__ import annotations
 
-import pandas as pd
-from typing import Dict, List
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-from app.models.service_model import ServiceModel
+import numpy as np
+
+from app.models.service_result import ServiceResult
 from app.services.ml_model_registry import get_model_artifact
+from app.services.model_artifact import linear_params
+
+# feature column -> key in the engine's feature map
+_FEATURE_KEYS = {
+    "f_rating_norm": "rating_norm",
+    "f_distance_closeness": "distance_closeness",
+    "f_open_now": "open_now",
+}
+
+
+def build_feature_matrix(
+    services: Sequence[ServiceResult],
+    features_by_id: Dict[int, Dict[str, float]],
+    hour: int,
+    dayofweek: int,
+    feature_cols: Sequence[str],
+) -> np.ndarray:
+    """
+    Writes candidate features straight into a preallocated (n, len(feature_cols)) matrix,
+    in feature_cols order. Unknown columns stay 0.0 (same as the old fillna(0.0)).
+    """
+    X = np.zeros((len(services), len(feature_cols)), dtype=np.float64)
+
+    per_service: List[Tuple[int, str]] = []
+    for j, col in enumerate(feature_cols):
+        if col in _FEATURE_KEYS:
+            per_service.append((j, _FEATURE_KEYS[col]))
+        elif col == "hour":
+            X[:, j] = hour
+        elif col == "dayofweek":
+            X[:, j] = dayofweek
+        # "position": don't use UI position as a feature here -> stays 0
+
+    for i, s in enumerate(services):
+        feats = features_by_id.get(s.id)
+        if not feats:
+            continue
+        for j, key in per_service:
+            X[i, j] = feats.get(key, 0.0)
+
+    return X
+
+
+def _tree_raw_scores(trees: Dict[str, Any], X: np.ndarray) -> np.ndarray:
+    """
+    Walks every (row, tree) pair one level per step, all at once: max_depth array steps
+    instead of rows x trees Python calls. Leaves point at themselves, so finished pairs idle.
+    """
+    n, d = X.shape
+    node = np.broadcast_to(trees["roots"], (n, trees["roots"].size)).copy()
+    flat_x = np.ascontiguousarray(X).ravel()
+    row_base = (np.arange(n) * d)[:, None]
+    children = trees["children"].ravel()  # [left0, right0, left1, right1, ...]
+
+    for _ in range(trees["max_depth"]):
+        x = flat_x[row_base + trees["feature"][node]]
+        go_right = (x > trees["threshold"][node]) | (np.isnan(x) & ~trees["missing_left"][node])
+        node = children[2 * node + go_right]
+    return trees["baseline"] + trees["value"][node].sum(axis=1)
+
+
+def predict_proba_matrix(artifact: Dict[str, Any], X: np.ndarray) -> np.ndarray:
+    """
+    Click probability for each row of X (columns in artifact["feature_cols"] order).
+    Portable (.npz) artifacts and linear sklearn models are scored directly from arrays
+    (coefficients, or flat tree arrays); anything else goes through the model's own
+    predict_proba on a DataFrame.
+    """
+    if artifact.get("kind") == "linear":
+        z = ((X - artifact["mean"]) / artifact["scale"]) @ artifact["coef"] + artifact["intercept"]
+        with np.errstate(over="ignore"):
+            return 1.0 / (1.0 + np.exp(-z))
+
+    if artifact.get("kind") == "trees":
+        with np.errstate(over="ignore"):
+            return 1.0 / (1.0 + np.exp(-_tree_raw_scores(artifact, X)))
+
+    model = artifact["model"]
+
+    params = linear_params(model)
+    if params is not None:
+        coef, intercept = params
+        with np.errstate(over="ignore"):
+            return 1.0 / (1.0 + np.exp(-(X @ coef + intercept)))
+
+    import pandas as pd  # fallback only: keeps pandas off the hot path
+
+    frame = pd.DataFrame(X, columns=list(artifact["feature_cols"]))
+    return np.asarray(model.predict_proba(frame)[:, 1], dtype=np.float64)
 
 
 def score_services_ml(
-    services: List[ServiceModel],
+    services: List[ServiceResult],
     features_by_id: Dict[int, Dict[str, float]],
     hour: int,
     dayofweek: int,
+    artifact: Optional[Dict[str, Any]] = None,
 ) -> Dict[int, float]:
-    artifact = get_model_artifact()
+    """
+    Pass the artifact the caller resolved from the registry so the scores match the
+    model version it logs; defaults to the currently active model.
+    """
+    if artifact is None:
+        artifact = get_model_artifact()
     if artifact is None:
         return {}  # ✅ no model -> fallback
 
     try:
-        model = artifact["model"]
-        feature_cols = artifact["feature_cols"]
-
-        rows = []
-        ids = []
-
-        for s in services:
-            feats = features_by_id.get(s.id, {})
-            row = {
-                "f_rating_norm": feats.get("rating_norm", 0.0),
-                "f_distance_closeness": feats.get("distance_closeness", 0.0),
-                "f_open_now": feats.get("open_now", 0.0),
-                "position": 0,       # don't use UI position as a feature here
-                "hour": hour,
-                "dayofweek": dayofweek,
-            }
-            rows.append(row)
-            ids.append(s.id)
-
-        X = pd.DataFrame(rows)[feature_cols].fillna(0.0)
-        proba = model.predict_proba(X)[:, 1]
-
-        return {sid: float(p) for sid, p in zip(ids, proba)}
+        X = build_feature_matrix(services, features_by_id, hour, dayofweek, artifact["feature_cols"])
+        proba = predict_proba_matrix(artifact, X)
+
+        return {s.id: float(p) for s, p in zip(services, proba)}
 
     except Exception:
-        return {}  # ✅ any inference error -> fallback
\ No newline at end of file
+        return {}  # ✅ any inference error -> fallback
@@ -0,0 +1,148 @@
+# app/services/model_artifact.py
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+# Portable ranker artifact: plain NumPy arrays + a JSON header in one .npz.
+# Serving loads it with np.load only -- no sklearn / joblib import, no unpickling.
+PORTABLE_FORMAT = "reco-linear-v1"
+TREES_FORMAT = "reco-trees-v1"
+_HEADER_KEYS = ("format", "kind", "version", "feature_cols", "intercept", "baseline", "max_depth")
+
+
+def linear_params(model: Any) -> Optional[Tuple[np.ndarray, float]]:
+    """
+    (coef, intercept) for binary logistic models, where P(click) = sigmoid(X @ coef + b).
+    """
+    name = type(model).__name__
+    is_logistic = name == "LogisticRegression" or (
+        name == "SGDClassifier" and getattr(model, "loss", None) == "log_loss"
+    )
+    if not is_logistic or len(getattr(model, "classes_", ())) != 2:
+        return None
+    return np.asarray(model.coef_, dtype=np.float64).ravel(), float(np.ravel(model.intercept_)[0])
+
+
+def tree_arrays(model: Any) -> Optional[Dict[str, Any]]:
+    """
+    A binary HistGradientBoostingClassifier as flat node arrays, all trees concatenated:
+    feature, threshold, children (global node ids, [left, right]), leaf value,
+    missing-goes-left, is_leaf, plus one root id per tree. P(click) = sigmoid(baseline + sum of reached leaf values).
+    """
+    if type(model).__name__ != "HistGradientBoostingClassifier" or len(getattr(model, "classes_", ())) != 2:
+        return None
+    if getattr(model, "is_categorical_", None) is not None and np.any(model.is_categorical_):
+        return None  # bitset splits aren't exported
+
+    feature, threshold, children, value, missing_left, is_leaf, roots = [], [], [], [], [], [], []
+    offset, max_depth = 0, 0
+    for (predictor,) in model._predictors:  # one tree per iteration for binary loss
+        nodes = predictor.nodes
+        leaf = nodes["is_leaf"].astype(bool)
+        roots.append(offset)
+        feature.append(nodes["feature_idx"].astype(np.int32))
+        threshold.append(nodes["num_threshold"].astype(np.float64))
+        # leaves point at themselves so evaluation can keep stepping
+        own = np.arange(offset, offset + len(nodes), dtype=np.int32)
+        children.append(np.stack([
+            np.where(leaf, own, nodes["left"].astype(np.int32) + offset),
+            np.where(leaf, own, nodes["right"].astype(np.int32) + offset),
+        ], axis=1))
+        value.append(np.where(leaf, nodes["value"], 0.0).astype(np.float64))
+        missing_left.append(nodes["missing_go_to_left"].astype(bool))
+        is_leaf.append(leaf)
+        max_depth = max(max_depth, int(nodes["depth"].max()))
+        offset += len(nodes)
+
+    return {
+        "baseline": float(np.ravel(model._baseline_prediction)[0]),
+        "max_depth": max_depth,
+        "roots": np.asarray(roots, dtype=np.int32),
+        "feature": np.concatenate(feature),
+        "threshold": np.concatenate(threshold),
+        "children": np.concatenate(children),
+        "value": np.concatenate(value),
+        "missing_left": np.concatenate(missing_left),
+        "is_leaf": np.concatenate(is_leaf),
+    }
+
+
+def to_portable(artifact: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Flattens a trained artifact ({"model", "feature_cols", ...}) into the portable form,
+    or None if the model isn't one we can express as arrays.
+    A Pipeline of StandardScaler -> logistic model keeps the scaler as mean/scale;
+    a HistGradientBoostingClassifier becomes flat tree arrays.
+    """
+    model = artifact["model"]
+
+    trees = tree_arrays(model)
+    if trees is not None:
+        return {
+            "format": TREES_FORMAT,
+            "kind": "trees",
+            "version": artifact.get("version"),
+            "feature_cols": list(artifact["feature_cols"]),
+            **trees,
+        }
+
+    n = len(artifact["feature_cols"])
+    mean = np.zeros(n, dtype=np.float64)
+    scale = np.ones(n, dtype=np.float64)
+
+    steps = getattr(model, "steps", None)
+    if steps is not None:
+        *pre, (_, model) = steps
+        if len(pre) > 1:
+            return None
+        if pre:
+            scaler = pre[0][1]
+            if type(scaler).__name__ != "StandardScaler":
+                return None
+            if getattr(scaler, "mean_", None) is not None:
+                mean = np.asarray(scaler.mean_, dtype=np.float64)
+            if getattr(scaler, "scale_", None) is not None:
+                scale = np.asarray(scaler.scale_, dtype=np.float64)
+
+    params = linear_params(model)
+    if params is None:
+        return None
+    coef, intercept = params
+
+    return {
+        "format": PORTABLE_FORMAT,
+        "kind": "linear",
+        "version": artifact.get("version"),
+        "feature_cols": list(artifact["feature_cols"]),
+        "coef": coef,
+        "intercept": intercept,
+        "mean": mean,
+        "scale": scale,
+    }
+
+
+def save_portable(portable: Dict[str, Any], path: Path) -> Path:
+    header = {k: portable[k] for k in _HEADER_KEYS if k in portable}
+    arrays = {k: v for k, v in portable.items() if k not in _HEADER_KEYS}
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("wb") as f:  # file object: np.savez would append ".npz" to the tmp name
+        np.savez(f, header=np.array(json.dumps(header)), **arrays)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_portable(path: Path) -> Dict[str, Any]:
+    with np.load(path, allow_pickle=False) as data:
+        header = json.loads(str(data["header"]))
+        if header.get("format") not in (PORTABLE_FORMAT, TREES_FORMAT):
+            raise ValueError(f"unsupported artifact format: {header.get('format')!r}")
+        arrays = {k: data[k] for k in data.files if k != "header"}
+    for k in ("coef", "mean", "scale"):
+        if k in arrays:
+            arrays[k] = arrays[k].astype(np.float64)
+    return {**header, **arrays}
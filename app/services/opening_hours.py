@@ -0,0 +1,230 @@
+# app/services/opening_hours.py
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+from app.models.service_model import ServiceModel
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+AVG_SPEED_KMH = 30.0
+CLOSING_BUFFER_MIN = 20.0
+
+
+def parse_hhmm(value: str) -> int:
+    hh, mm = value.strip().split(":")
+    return int(hh) * 60 + int(mm)
+
+
+def travel_minutes(distance_km: float) -> float:
+    return (distance_km / AVG_SPEED_KMH) * 60
+
+
+@dataclass(frozen=True)
+class ClockSnapshot:
+    """
+    One clock reading per request; every availability check in that request uses it.
+    """
+    now: datetime
+    today: date
+    minute_of_week: float
+
+    @classmethod
+    def take(cls, now: Optional[datetime] = None) -> "ClockSnapshot":
+        now = now or datetime.now()
+        minute = (
+            now.weekday() * MINUTES_PER_DAY
+            + now.hour * 60
+            + now.minute
+            + (now.second + now.microsecond / 1e6) / 60
+        )
+        return cls(now=now, today=now.date(), minute_of_week=minute)
+
+
+def _day_intervals(service: ServiceModel) -> list[tuple[int, int]]:
+    """
+    (start, end) in minute-of-week. Overnight hours (close <= open) end on the next day,
+    so end can run past MINUTES_PER_WEEK for Sunday night; lookups account for the wrap.
+    """
+    weekly = getattr(service, "weekly_hours", None)
+    out: list[tuple[int, int]] = []
+
+    for day, name in enumerate(WEEKDAYS):
+        if weekly is not None:
+            slots = weekly.get(name) or []
+        else:
+            slots = [(service.open, service.close)]
+
+        for open_, close in slots:
+            start = day * MINUTES_PER_DAY + parse_hhmm(open_)
+            end = day * MINUTES_PER_DAY + parse_hhmm(close)
+            if end <= start:
+                end += MINUTES_PER_DAY
+            out.append((start, end))
+
+    return out
+
+
+@dataclass(frozen=True)
+class OpeningHours:
+    """
+    A service's opening hours compiled once into minute-of-week intervals.
+    Holidays close every interval that starts on that date.
+    """
+    intervals: tuple[tuple[int, int], ...]
+    holidays: frozenset[date] = frozenset()
+
+    @classmethod
+    def compile(cls, service: ServiceModel) -> "OpeningHours":
+        return cls(
+            intervals=tuple(_day_intervals(service)),
+            holidays=frozenset(getattr(service, "holidays", None) or ()),
+        )
+
+    def remaining_minutes(self, clock: ClockSnapshot) -> Optional[float]:
+        """
+        Minutes until the current opening interval ends, or None when closed.
+        """
+        best: Optional[float] = None
+        for start, end in self.intervals:
+            for minute in (clock.minute_of_week, clock.minute_of_week + MINUTES_PER_WEEK):
+                if not (start <= minute <= end):
+                    continue
+                if self.holidays:
+                    days_back = int(minute // MINUTES_PER_DAY) - start // MINUTES_PER_DAY
+                    if date.fromordinal(clock.today.toordinal() - days_back) in self.holidays:
+                        continue
+                left = end - minute
+                if best is None or left > best:
+                    best = left
+        return best
+
+    def status(self, clock: ClockSnapshot, distance_km: float) -> tuple[bool, str]:
+        """
+        Same rules as before: open, and reachable 20 min before closing.
+        """
+        return self.status_from_remaining(self.remaining_minutes(clock), distance_km)
+
+    @staticmethod
+    def status_from_remaining(left: Optional[float], distance_km: float) -> tuple[bool, str]:
+        """
+        status() from a remaining_minutes() reading; lets a batch evaluate the hours once
+        and reuse them for every query's travel time.
+        """
+        if left is None:
+            return False, "closed"
+        if travel_minutes(distance_km) <= left - CLOSING_BUFFER_MIN:
+            return True, "open"
+        return False, "closing_soon"
+
+
+class OpeningHoursIndex:
+    """
+    Opening hours for many services as flat NumPy arrays (one row per interval, grouped by service),
+    for vectorised "open at arrival time" checks.
+    """
+
+    def __init__(self, services: Sequence[ServiceModel]):
+        compiled = [OpeningHours.compile(s) for s in services]
+
+        counts = np.array([len(h.intervals) for h in compiled], dtype=np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+        self.iv_start = np.array([a for h in compiled for a, _ in h.intervals], dtype=np.float64)
+        self.iv_end = np.array([b for h in compiled for _, b in h.intervals], dtype=np.float64)
+        self.iv_owner = np.repeat(np.arange(len(compiled)), counts)
+
+        # (service row, date ordinal) pairs packed into one int for np.isin
+        pairs = [(i, d.toordinal()) for i, h in enumerate(compiled) for d in h.holidays]
+        self._holiday_keys = np.array([i * 10_000_000 + o for i, o in pairs], dtype=np.int64)
+
+    def _gather(self, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        starts = self.offsets[rows]
+        counts = self.offsets[rows + 1] - starts
+        total = int(counts.sum())
+        local = np.repeat(np.arange(len(rows)), counts)
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        iv = np.repeat(starts, counts) + (np.arange(total) - first)
+        return iv, local
+
+    def remaining_minutes(self, clock: ClockSnapshot, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Minutes until closing for each row (NaN when closed).
+        """
+        if rows is None:
+            rows = np.arange(len(self.offsets) - 1)
+        rows = np.asarray(rows, dtype=np.int64)
+        iv, local = self._gather(rows)
+
+        start, end = self.iv_start[iv], self.iv_end[iv]
+        minute = np.full(iv.shape, clock.minute_of_week)
+        wrapped = ~((start <= minute) & (minute <= end))
+        minute[wrapped] += MINUTES_PER_WEEK
+        inside = (start <= minute) & (minute <= end)
+
+        if self._holiday_keys.size:
+            days_back = (minute // MINUTES_PER_DAY - start // MINUTES_PER_DAY).astype(np.int64)
+            start_date = clock.today.toordinal() - days_back
+            keys = rows[local] * 10_000_000 + start_date
+            inside &= ~np.isin(keys, self._holiday_keys)
+
+        left = np.full(len(rows), -np.inf)
+        np.maximum.at(left, local[inside], (end - minute)[inside])
+        left[np.isneginf(left)] = np.nan
+        return left
+
+    def open_at_arrival(
+        self, clock: ClockSnapshot, distance_km: np.ndarray, rows: Optional[np.ndarray] = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorised OpeningHours.status: returns (is_available, in_hours) boolean arrays.
+        """
+        return self.available_from_remaining(self.remaining_minutes(clock, rows), distance_km)
+
+    @staticmethod
+    def available_from_remaining(
+        left: np.ndarray, distance_km: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (is_available, in_hours) from remaining_minutes(); lets a batch evaluate the hours
+        once and reuse them for every query's travel times.
+        """
+        in_hours = ~np.isnan(left)
+        arrival = np.asarray(distance_km, dtype=np.float64) / AVG_SPEED_KMH * 60
+        with np.errstate(invalid="ignore"):
+            is_available = in_hours & (arrival <= left - CLOSING_BUFFER_MIN)
+        return is_available, in_hours
+
+
+def compile_opening_hours(services: Iterable[ServiceModel]) -> dict[int, OpeningHours]:
+    return {s.id: OpeningHours.compile(s) for s in services}
+
+
+def status_boundaries(hours: Iterable[OpeningHours]) -> np.ndarray:
+    """
+    Sorted minute-of-week instants at which some open/closed/closing_soon status may flip:
+    opening times, closing times, the closing buffer before them, and every midnight (holidays).
+    """
+    marks = {day * MINUTES_PER_DAY for day in range(7)}
+    for h in hours:
+        for start, end in h.intervals:
+            marks.add(start % MINUTES_PER_WEEK)
+            marks.add(end % MINUTES_PER_WEEK)
+            marks.add((end - CLOSING_BUFFER_MIN) % MINUTES_PER_WEEK)
+    return np.array(sorted(marks), dtype=np.float64)
+
+
+def minutes_until_next_boundary(boundaries: np.ndarray, clock: ClockSnapshot) -> tuple[int, float]:
+    """
+    (bucket number within the week, minutes until the bucket ends) for a clock reading.
+    """
+    minute = clock.minute_of_week
+    i = int(np.searchsorted(boundaries, minute, side="right"))
+    if i < len(boundaries):
+        return i, float(boundaries[i] - minute)
+    return i, float(boundaries[0] + MINUTES_PER_WEEK - minute)
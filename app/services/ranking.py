@@ -0,0 +1,52 @@
+# app/services/ranking.py
+from __future__ import annotations
+
+import heapq
+from typing import Any, Callable, Iterable, Optional, TypeVar
+
+import numpy as np
+
+T = TypeVar("T")
+
+
+def top_k(items: Iterable[T], k: Optional[int], key: Callable[[T], Any]) -> list[T]:
+    """
+    Bounded ranking: the k items with the smallest key, in key order.
+    Same result (including ties) as sorted(items, key=key)[:k], but O(n log k): ties keep
+    input order, so callers whose input order is not meaningful need a total key.
+    k=None keeps everything (full sort).
+    """
+    if k is None:
+        return sorted(items, key=key)
+    if k <= 0:
+        return []
+    return heapq.nsmallest(k, items, key=key)
+
+
+def top_k_indices(keys: np.ndarray, k: int, tiebreak: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    NumPy variant: indices of the k smallest keys, in key order, ties broken by tiebreak
+    (ascending), else by position (matches a stable sort). Uses argpartition, so only k rows
+    are fully sorted.
+    """
+    n = keys.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        part = np.argpartition(keys, k - 1)[:k]
+        # argpartition is not stable: pull in every row tied with the k-th key, then trim
+        kth = keys[part].max()
+        part = np.flatnonzero(keys <= kth)
+    else:
+        part = np.arange(n)
+    second = part if tiebreak is None else tiebreak[part]
+    return part[np.lexsort((part, second, keys[part]))][:k]
+
+
+def availability_rank_key(x: Any) -> tuple[bool, float, int]:
+    """
+    Open services first, then higher score, then lower service id. The id makes the order
+    total: candidates arrive in spatial-bucket or shard order, which must not decide ties.
+    """
+    return (not x.is_available, -(x.score or 0.0), x.id)
@@ -0,0 +1,140 @@
+# app/services/recommendation_cache.py
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from app.models.service_model import ServiceModel
+from app.models.service_result import ServiceResult
+from app.services.opening_hours import ClockSnapshot
+from app.services.recommendation_engine import RecommendationEngine
+from app.services.spatial_index import geohash_encode
+
+RECO_CACHE_SIZE = int(os.getenv("RECO_CACHE_SIZE", "10000"))
+RECO_CACHE_PRECISION = int(os.getenv("RECO_CACHE_PRECISION", "6"))
+RECO_CACHE_MAX_TTL_MIN = float(os.getenv("RECO_CACHE_MAX_TTL_MIN", "60"))
+
+
+@dataclass(frozen=True)
+class _Entry:
+    services: tuple[ServiceModel, ...]
+    # is_available of each service when the entry was filled
+    available: tuple[bool, ...]
+    expires_at: datetime
+
+
+class RecommendationCache:
+    """
+    LRU cache for rules-mode results, keyed by
+    (service_type, geohash cell of lat/lng, open-status time bucket, catalog version).
+
+    Entries store the ranked candidate services only; on a hit the engine recomputes exact
+    distances, status and scores for those few services at the user's real location.
+    An entry expires at the next opening-hours boundary for its service type, so open/closed
+    status is never served stale. "Reachable before closing" depends on travel time, so it can
+    flip inside a bucket: a hit whose rescore changes any is_available is treated as a miss.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RECO_CACHE_SIZE,
+        precision: int = RECO_CACHE_PRECISION,
+        max_ttl_minutes: float = RECO_CACHE_MAX_TTL_MIN,
+    ):
+        self.max_entries = max_entries
+        self.precision = precision
+        self.max_ttl_minutes = max_ttl_minutes
+
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key: tuple, now: datetime) -> Optional[_Entry]:
+        # hit/miss counters are updated under the lock so concurrent requests don't lose counts
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+    def _invalidate(self, key: tuple, entry: _Entry) -> None:
+        # a hit that turned out stale: count it as the miss it is
+        with self._lock:
+            self.hits -= 1
+            self.misses += 1
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+
+    def _put(self, key: tuple, entry: _Entry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def recommend(
+        self,
+        engine: RecommendationEngine,
+        catalog_version: str,
+        user_lat: float,
+        user_lng: float,
+        service_type: str,
+        clock: Optional[ClockSnapshot] = None,
+    ) -> tuple[list[ServiceResult], dict[int, dict[str, float]]]:
+        clock = clock or ClockSnapshot.take()
+        bucket, minutes_left = engine.status_bucket(service_type, clock)
+        key = (
+            service_type,
+            geohash_encode(user_lat, user_lng, self.precision),
+            (clock.today.toordinal() - clock.today.weekday(), bucket),
+            catalog_version,
+        )
+
+        entry = self._get(key, clock.now)
+        if entry is not None:
+            results, feats = engine.rescore(list(entry.services), user_lat, user_lng, clock)
+            available = dict(zip((s.id for s in entry.services), entry.available))
+            if all(available[r.service.id] == r.is_available for r in results):
+                return results, feats
+            # a cached service became unreachable before closing: others may now outrank it
+            self._invalidate(key, entry)
+
+        results, feats = engine.recommend_with_features(user_lat, user_lng, service_type, clock)
+
+        ttl = min(minutes_left, self.max_ttl_minutes)
+        if ttl > 0:
+            self._put(
+                key,
+                _Entry(
+                    services=tuple(r.service for r in results),
+                    available=tuple(r.is_available for r in results),
+                    expires_at=clock.now + timedelta(minutes=ttl),
+                ),
+            )
+        return results, feats
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses, entries = self.hits, self.misses, len(self._entries)
+        total = hits + misses
+        return {
+            "entries": entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": (hits / total) if total else 0.0,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -1,50 +1,165 @@
-
 # app/services/recommendation_engine.py
 from __future__ import annotations
 
+from collections import defaultdict
+
 from app.features.feature_builder import FeatureBuilder
 from app.features.feature_config import FeatureConfig
+from app.features.feature_store import get_feature_store
 from app.models.service_model import ServiceModel
-from app.services.distance_calculator import DistanceCalculator
+from app.models.service_result import ServiceResult
 from app.services.availability_checker import AvailabilityChecker
+from app.services.columnar_catalog import ColumnarCatalog
+from app.services.distance_calculator import DistanceCalculator
+from app.services.opening_hours import (
+    ClockSnapshot,
+    OpeningHours,
+    compile_opening_hours,
+    minutes_until_next_boundary,
+    status_boundaries,
+)
+from app.services.ranking import availability_rank_key, top_k
+from app.services.spatial_index import ServiceSpatialIndex
 
 class RecommendationEngine:
-    def __init__(self, services: list[ServiceModel], config: FeatureConfig | None = None):
+    def __init__(
+        self,
+        services: list[ServiceModel],
+        config: FeatureConfig | None = None,
+        index_cell_km: float = 2.0,
+        columnar: bool = False,
+        catalog_version: str | None = None,
+    ):
         self.services = services
         self.config = config or FeatureConfig()
         self.feature_builder = FeatureBuilder(self.config)
+        # request-independent features, shared per (catalog version, config)
+        self.feature_store = get_feature_store(services, self.config, catalog_version)
+        # built once; every request only scans the cells around the user
+        self.index = ServiceSpatialIndex(services, cell_km=index_cell_km)
+        self.opening_hours = compile_opening_hours(services)
+
+        hours_by_type = defaultdict(list)
+        for s in services:
+            hours_by_type[s.type].append(self.opening_hours[s.id])
+        self._status_boundaries = {t: status_boundaries(h) for t, h in hours_by_type.items()}
+        # optional NumPy path: scores all candidates at once, materialises only the top rows
+        self.columns = ColumnarCatalog(services, self.feature_store) if columnar else None
 
     def recommend_with_features(
-        self, user_lat: float, user_lng: float, service_type: str
-    ) -> tuple[list[ServiceModel], dict[int, dict[str, float]]]:
-
-        filtered = [s for s in self.services if s.type == service_type]
-        feature_map: dict[int, dict[str, float]] = {}
-
-        for s in filtered:
-            s.distance_km = round(
-                DistanceCalculator.haversine(user_lat, user_lng, s.lat, s.lng), 2
+        self,
+        user_lat: float,
+        user_lng: float,
+        service_type: str,
+        clock: ClockSnapshot | None = None,
+    ) -> tuple[list[ServiceResult], dict[int, dict[str, float]]]:
+
+        clock = clock or ClockSnapshot.take()
+
+        if self.columns is not None:
+            return self.columns.recommend_with_features(
+                user_lat, user_lng, service_type, self.config, clock
             )
 
-            is_open, status = AvailabilityChecker.is_open_now(s, s.distance_km)
-            s.is_available = is_open
-            s.status = status
+        candidates = self.index.within(
+            service_type, user_lat, user_lng, self.config.max_distance_km
+        )
+        return self._score_candidates(candidates, clock, self.config.max_results)
+
+    def rescore(
+        self,
+        services: list[ServiceModel],
+        user_lat: float,
+        user_lng: float,
+        clock: ClockSnapshot | None = None,
+    ) -> tuple[list[ServiceResult], dict[int, dict[str, float]]]:
+        """
+        Re-ranks a known candidate list (e.g. from the result cache) with exact distances.
+        """
+        clock = clock or ClockSnapshot.take()
+        candidates = [
+            (DistanceCalculator.haversine(user_lat, user_lng, s.lat, s.lng), s) for s in services
+        ]
+        return self._score_candidates(candidates, clock, self.config.max_results)
+
+    def status_bucket(self, service_type: str, clock: ClockSnapshot) -> tuple[int, float]:
+        """
+        (bucket, minutes left) of the current open-status window for a service type:
+        no open/close/closing_soon transition happens for that type before the bucket ends.
+        """
+        boundaries = self._status_boundaries.get(service_type)
+        if boundaries is None:
+            return 0, float("inf")
+        return minutes_until_next_boundary(boundaries, clock)
+
+    def _score_candidates(
+        self,
+        candidates: list[tuple[float, ServiceModel]],
+        clock: ClockSnapshot,
+        k: int,
+        remaining: dict[int, float | None] | None = None,
+    ) -> tuple[list[ServiceResult], dict[int, dict[str, float]]]:
+        """
+        remaining: per-batch memo of OpeningHours.remaining_minutes by service id, shared by
+        all queries of a batch so each service's hours are evaluated once.
+        """
+        results: list[ServiceResult] = []
+        feature_map: dict[int, dict[str, float]] = {}
 
-            feats = self.feature_builder.build(s)
+        for distance_km, s in candidates:
+            distance_km = round(distance_km, 2)
+            if remaining is None:
+                is_open, status = AvailabilityChecker.is_open_now(
+                    s, distance_km, clock=clock, hours=self.opening_hours.get(s.id)
+                )
+            else:
+                if s.id not in remaining:
+                    hours = self.opening_hours.get(s.id) or OpeningHours.compile(s)
+                    remaining[s.id] = hours.remaining_minutes(clock)
+                is_open, status = OpeningHours.status_from_remaining(remaining[s.id], distance_km)
+            view = ServiceResult(s, distance_km=distance_km, is_available=is_open, status=status)
+
+            feats = self.feature_builder.build(view, self.feature_store.get(s.id))
             feature_map[s.id] = feats
 
-            s.score = (
+            score = (
                 feats["rating_norm"] * self.config.weight_rating
                 + feats["distance_closeness"] * self.config.weight_distance
                 + feats["open_now"] * self.config.weight_open_now
             )
-
-        filtered.sort(key=lambda x: (not x.is_available, -(x.score or 0.0)))
-        top = filtered[: self.config.max_results]
-        return top, feature_map
+            results.append(view._replace(score=score))
+
+        return top_k(results, k, key=availability_rank_key), feature_map
+
+    def recommend_batch(
+        self,
+        queries: list[tuple[float, float, str]],
+        clock: ClockSnapshot | None = None,
+    ) -> list[tuple[list[ServiceResult], dict[int, dict[str, float]]]]:
+        """
+        Many (lat, lng, service_type) queries against one clock reading, results in query order.
+        Both modes evaluate opening hours once per service for the whole batch: columnar scans
+        each type once (union bounding box); the default path looks candidates up in the spatial
+        index per query and shares one remaining-minutes memo across queries.
+        """
+        clock = clock or ClockSnapshot.take()
+
+        if self.columns is not None:
+            return self.columns.recommend_batch(queries, self.config, clock)
+
+        remaining: dict[int, float | None] = {}
+        return [
+            self._score_candidates(
+                self.index.within(service_type, lat, lng, self.config.max_distance_km),
+                clock,
+                self.config.max_results,
+                remaining,
+            )
+            for lat, lng, service_type in queries
+        ]
 
     # keep old method for compatibility
-    def recommend(self, user_lat: float, user_lng: float, service_type: str) -> list[ServiceModel]:
+    def recommend(self, user_lat: float, user_lng: float, service_type: str) -> list[ServiceResult]:
         top, _ = self.recommend_with_features(user_lat, user_lng, service_type)
         return top
 
@@ -5,10 +5,10 @@ import json
 from dataclasses import asdict, dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from app.models.recommendation_context import RecommendationContext
-from app.models.service_model import ServiceModel
+from app.models.service_result import ServiceResult
 
 @dataclass
 class RecommendedItemLog:
@@ -25,16 +25,22 @@ class RecommendationEventLogger:
         self.path.parent.mkdir(parents=True, exist_ok=True)
 
     def _write(self, payload: Dict[str, Any]) -> None:
+        self._write_many([payload])
+
+    def _write_many(self, payloads: List[Dict[str, Any]]) -> None:
+        if not payloads:
+            return
+        lines = "".join(json.dumps(p, ensure_ascii=False) + "\n" for p in payloads)
         with self.path.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+            f.write(lines)
 
-    def log_impression(
+    def _impression_payload(
         self,
         context: RecommendationContext,
-        recommended: List[ServiceModel],
+        recommended: List[ServiceResult],
         features: Dict[int, Dict[str, float]],
-    ) -> None:
-        payload: Dict[str, Any] = {
+    ) -> Dict[str, Any]:
+        return {
             "event_type": "recommendation_impression",
             "timestamp": datetime.utcnow().isoformat(),
             "context": context.to_dict(),  # ✅ FIX
@@ -52,7 +58,23 @@ class RecommendationEventLogger:
                 for s in recommended
             ],
         }
-        self._write(payload)
+
+    def log_impression(
+        self,
+        context: RecommendationContext,
+        recommended: List[ServiceResult],
+        features: Dict[int, Dict[str, float]],
+    ) -> None:
+        self._write(self._impression_payload(context, recommended, features))
+
+    def log_impressions(
+        self,
+        batch: List[Tuple[RecommendationContext, List[ServiceResult], Dict[int, Dict[str, float]]]],
+    ) -> None:
+        """
+        Logs many impressions with a single file append (used by /recommend/batch).
+        """
+        self._write_many([self._impression_payload(c, r, f) for c, r, f in batch])
 
     def log_click(
         self,
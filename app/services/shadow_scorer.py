@@ -0,0 +1,175 @@
+# app/services/shadow_scorer.py
+from __future__ import annotations
+
+import json
+import logging
+import os
+import queue
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.models.service_result import ServiceResult
+from app.services.ml_model_registry import ModelRegistry, get_model_registry
+from app.services.ml_ranker import build_feature_matrix, predict_proba_matrix
+
+log = logging.getLogger(__name__)
+
+RECO_SHADOW_ML = os.getenv("RECO_SHADOW_ML", "0") == "1"
+SHADOW_QUEUE_SIZE = int(os.getenv("SHADOW_QUEUE_SIZE", "1000"))
+SHADOW_LOG_PATH = "data/reco_shadow.jsonl"
+
+
+@dataclass
+class _ShadowJob:
+    request_id: str
+    service_type: str
+    request_time: datetime
+    results: List[ServiceResult]
+    features: Dict[int, Dict[str, float]]
+
+
+class ShadowScorer:
+    """
+    Scores the rules ranker's candidates with the current ML model off the request path.
+    /recommend only enqueues (never blocks: a full queue drops the job and counts it);
+    a background thread scores and appends shadow scores + rank deltas to a separate log
+    that build_dataset.py joins onto the training rows.
+    """
+
+    def __init__(
+        self,
+        logfile: str = SHADOW_LOG_PATH,
+        max_queue: int = SHADOW_QUEUE_SIZE,
+        registry: Optional[ModelRegistry] = None,
+    ):
+        self.path = Path(logfile)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.registry = registry or get_model_registry()
+
+        self._queue: "queue.Queue[Optional[_ShadowJob]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+
+        self.submitted = 0
+        self.dropped = 0
+        self.scored = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(
+        self,
+        request_id: str,
+        service_type: str,
+        request_time: datetime,
+        results: List[ServiceResult],
+        features: Dict[int, Dict[str, float]],
+    ) -> bool:
+        if not self.running or not results:
+            return False
+        try:
+            self._queue.put_nowait(_ShadowJob(request_id, service_type, request_time, results, features))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def _score(self, job: _ShadowJob, model) -> Dict[str, Any]:
+        X = build_feature_matrix(
+            job.results, job.features, job.request_time.hour, job.request_time.weekday(),
+            model.artifact["feature_cols"],
+        )
+        proba = predict_proba_matrix(model.artifact, X)
+
+        # ml rank with the same open-first rule the ML route uses
+        order = sorted(range(len(job.results)), key=lambda i: (not job.results[i].is_available, -proba[i]))
+        ml_rank = np.empty(len(order), dtype=int)
+        ml_rank[order] = np.arange(len(order))
+
+        return {
+            "event_type": "shadow_ml_score",
+            "timestamp": datetime.utcnow().isoformat(),
+            "request_id": job.request_id,
+            "service_type": job.service_type,
+            "model_version": model.version,
+            "items": [
+                {
+                    "service_id": s.id,
+                    "rules_rank": i,
+                    "rules_score": s.score,
+                    "ml_score": float(proba[i]),
+                    "ml_rank": int(ml_rank[i]),
+                    "rank_delta": int(ml_rank[i]) - i,
+                }
+                for i, s in enumerate(job.results)
+            ],
+        }
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            # drain whatever else is waiting so the log gets one append per burst
+            jobs = [job]
+            while len(jobs) < 256:
+                try:
+                    nxt = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    self._queue.put(None)
+                    break
+                jobs.append(nxt)
+
+            model = self.registry.active()
+            if model is None:
+                continue
+
+            lines = []
+            for j in jobs:
+                try:
+                    lines.append(json.dumps(self._score(j, model), ensure_ascii=False) + "\n")
+                except Exception:
+                    log.exception("shadow scoring failed for request %s", j.request_id)
+            if lines:
+                with self.path.open("a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+                self.scored += len(lines)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="shadow-ml-scorer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if not self.running:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass  # daemon thread; don't hold up shutdown
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "scored": self.scored,
+            "queued": self._queue.qsize(),
+        }
+
+
+_shadow = ShadowScorer()
+
+
+def get_shadow_scorer() -> ShadowScorer:
+    return _shadow
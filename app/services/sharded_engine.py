@@ -0,0 +1,199 @@
+# app/services/sharded_engine.py
+from __future__ import annotations
+
+import math
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from app.features.feature_config import FeatureConfig
+from app.models.service_model import ServiceModel
+from app.models.service_result import ServiceResult
+from app.services.opening_hours import (
+    ClockSnapshot,
+    compile_opening_hours,
+    minutes_until_next_boundary,
+    status_boundaries,
+)
+from app.services.ranking import availability_rank_key, top_k
+from app.services.recommendation_engine import RecommendationEngine
+from app.services.spatial_index import KM_PER_DEG_LAT
+
+# --- worker side: each shard process owns one RecommendationEngine ---
+
+_SHARD_ENGINE: Optional[RecommendationEngine] = None
+
+
+def _init_shard(services: list[ServiceModel], config: FeatureConfig, engine_kwargs: Dict[str, Any]) -> None:
+    global _SHARD_ENGINE
+    _SHARD_ENGINE = RecommendationEngine(services, config=config, **engine_kwargs)
+
+
+def _shard_ready() -> int:
+    return len(_SHARD_ENGINE.services)
+
+
+def _shard_recommend_batch(queries: list[tuple[float, float, str]], clock: ClockSnapshot):
+    return _SHARD_ENGINE.recommend_batch(queries, clock)
+
+
+# --- parent side ---
+
+def split_by_geography(services: list[ServiceModel], shards: int) -> list[list[ServiceModel]]:
+    """
+    k-d style split: alternately cut by lng and lat so every shard gets about the same
+    number of services and covers one compact area.
+    """
+    def _split(items: list[ServiceModel], n: int, by_lng: bool) -> list[list[ServiceModel]]:
+        if n <= 1 or len(items) <= 1:
+            return [items]
+        items = sorted(items, key=(lambda s: s.lng) if by_lng else (lambda s: s.lat))
+        left_n = n // 2
+        cut = len(items) * left_n // n
+        return _split(items[:cut], left_n, not by_lng) + _split(items[cut:], n - left_n, not by_lng)
+
+    return [part for part in _split(list(services), shards, True) if part]
+
+
+@dataclass(frozen=True)
+class _Shard:
+    pool: ProcessPoolExecutor
+    min_lat: float
+    max_lat: float
+    min_lng: float
+    max_lng: float
+    size: int
+
+    def intersects(self, lat: float, lng: float, radius_km: float) -> bool:
+        dlat = radius_km / KM_PER_DEG_LAT
+        edge_lat = min(max(abs(lat - dlat), abs(lat + dlat)), 89.0)
+        dlng = radius_km / (KM_PER_DEG_LAT * math.cos(math.radians(edge_lat)))
+        return (
+            lat + dlat >= self.min_lat and lat - dlat <= self.max_lat
+            and lng + dlng >= self.min_lng and lng - dlng <= self.max_lng
+        )
+
+
+class ShardedRecommendationEngine:
+    """
+    Optional multi-process mode for country-scale catalogs.
+    The catalog is split by geography into shards, each owned by its own worker process with a
+    normal RecommendationEngine. A query fans out only to shards whose area intersects the
+    search radius, and the per-shard top-k lists are merged here. Same interface and result
+    types as RecommendationEngine, so routes and the result cache work unchanged.
+    """
+
+    def __init__(
+        self,
+        services: list[ServiceModel],
+        config: FeatureConfig | None = None,
+        shards: int = 4,
+        engine_kwargs: Optional[Dict[str, Any]] = None,
+    ):
+        self.services = services
+        self.config = config or FeatureConfig()
+        engine_kwargs = engine_kwargs or {}
+
+        # spawn: safe to start from a threaded/async server process
+        ctx = multiprocessing.get_context("spawn")
+        self._shards: list[_Shard] = []
+        for part in split_by_geography(services, shards):
+            pool = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=ctx,
+                initializer=_init_shard,
+                initargs=(part, self.config, engine_kwargs),
+            )
+            self._shards.append(
+                _Shard(
+                    pool=pool,
+                    min_lat=min(s.lat for s in part),
+                    max_lat=max(s.lat for s in part),
+                    min_lng=min(s.lng for s in part),
+                    max_lng=max(s.lng for s in part),
+                    size=len(part),
+                )
+            )
+
+        # pools spawn lazily: run one task per shard now so process start + engine build happen
+        # here (before CatalogManager swaps this engine in), not on the first query
+        try:
+            for ready in [shard.pool.submit(_shard_ready) for shard in self._shards]:
+                ready.result()
+        except BaseException:
+            self.close()
+            raise
+
+        # cheap parent-side helpers for the result cache (rescore a handful, status buckets)
+        self._local = RecommendationEngine([], config=self.config)
+        hours = compile_opening_hours(services)
+        by_type = defaultdict(list)
+        for s in services:
+            by_type[s.type].append(hours[s.id])
+        self._status_boundaries = {t: status_boundaries(h) for t, h in by_type.items()}
+
+    @property
+    def shard_count(self) -> int:
+        return len(self._shards)
+
+    def recommend_batch(
+        self,
+        queries: list[tuple[float, float, str]],
+        clock: ClockSnapshot | None = None,
+    ) -> list[tuple[list[ServiceResult], dict[int, dict[str, float]]]]:
+        clock = clock or ClockSnapshot.take()
+        radius = self.config.max_distance_km
+
+        pending: list[tuple[Future, list[int]]] = []
+        for shard in self._shards:
+            qis = [i for i, (lat, lng, _) in enumerate(queries) if shard.intersects(lat, lng, radius)]
+            if qis:
+                sub = [queries[i] for i in qis]
+                pending.append((shard.pool.submit(_shard_recommend_batch, sub, clock), qis))
+
+        merged_results: list[list[ServiceResult]] = [[] for _ in queries]
+        merged_feats: list[dict[int, dict[str, float]]] = [{} for _ in queries]
+        for future, qis in pending:
+            for qi, (results, feats) in zip(qis, future.result()):
+                merged_results[qi].extend(results)
+                merged_feats[qi].update(feats)
+
+        k = self.config.max_results
+        return [
+            (top_k(results, k, key=availability_rank_key), feats)
+            for results, feats in zip(merged_results, merged_feats)
+        ]
+
+    def recommend_with_features(
+        self,
+        user_lat: float,
+        user_lng: float,
+        service_type: str,
+        clock: ClockSnapshot | None = None,
+    ) -> tuple[list[ServiceResult], dict[int, dict[str, float]]]:
+        return self.recommend_batch([(user_lat, user_lng, service_type)], clock)[0]
+
+    def recommend(self, user_lat: float, user_lng: float, service_type: str) -> list[ServiceResult]:
+        top, _ = self.recommend_with_features(user_lat, user_lng, service_type)
+        return top
+
+    def rescore(
+        self,
+        services: list[ServiceModel],
+        user_lat: float,
+        user_lng: float,
+        clock: ClockSnapshot | None = None,
+    ) -> tuple[list[ServiceResult], dict[int, dict[str, float]]]:
+        return self._local.rescore(services, user_lat, user_lng, clock)
+
+    def status_bucket(self, service_type: str, clock: ClockSnapshot) -> tuple[int, float]:
+        boundaries = self._status_boundaries.get(service_type)
+        if boundaries is None:
+            return 0, float("inf")
+        return minutes_until_next_boundary(boundaries, clock)
+
+    def close(self) -> None:
+        for shard in self._shards:
+            shard.pool.shutdown(wait=True, cancel_futures=False)
@@ -0,0 +1,148 @@
+# app/services/spatial_index.py
+from __future__ import annotations
+
+import heapq
+import math
+from collections import defaultdict
+from typing import Iterable
+
+from app.models.service_model import ServiceModel
+from app.services.distance_calculator import DistanceCalculator
+
+KM_PER_DEG_LAT = 111.32
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(lat: float, lng: float, precision: int = 6) -> str:
+    """
+    Standard base32 geohash. Precision 6 is a ~1.2 x 0.6 km cell, 7 is ~150 m.
+    """
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    out: list[str] = []
+    bits, ch, even = 0, 0, True
+
+    while len(out) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                ch = (ch << 1) | 1
+                lng_lo = mid
+            else:
+                ch <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            out.append(_GEOHASH_ALPHABET[ch])
+            bits, ch = 0, 0
+
+    return "".join(out)
+
+
+class GridSpatialIndex:
+    """
+    Buckets services into a fixed lat/lng grid.
+    A radius query only looks at the cells around the user instead of the whole catalog;
+    exact haversine distances are computed for those candidates only.
+    """
+
+    def __init__(self, services: Iterable[ServiceModel], cell_km: float = 2.0):
+        if cell_km <= 0:
+            raise ValueError("cell_km must be > 0")
+        self.cell_km = cell_km
+        self.cell_deg = cell_km / KM_PER_DEG_LAT
+        self._cells: dict[tuple[int, int], list[ServiceModel]] = defaultdict(list)
+        self.size = 0
+
+        for s in services:
+            self._cells[self._cell(s.lat, s.lng)].append(s)
+            self.size += 1
+
+    def _cell(self, lat: float, lng: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg)
+
+    def _cells_around(self, lat: float, lng: float, radius_km: float):
+        dlat = radius_km / KM_PER_DEG_LAT
+        # widest longitude span is at the bbox edge closest to a pole
+        edge_lat = min(max(abs(lat - dlat), abs(lat + dlat)), 89.0)
+        dlng = min(radius_km / (KM_PER_DEG_LAT * math.cos(math.radians(edge_lat))), 180.0)
+
+        i0, j0 = self._cell(lat - dlat, lng - dlng)
+        i1, j1 = self._cell(lat + dlat, lng + dlng)
+
+        # huge radius vs. sparse grid: walking the occupied cells is cheaper
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self._cells):
+            for (i, j), bucket in self._cells.items():
+                if i0 <= i <= i1 and j0 <= j <= j1:
+                    yield bucket
+            return
+
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                bucket = self._cells.get((i, j))
+                if bucket:
+                    yield bucket
+
+    def within(self, lat: float, lng: float, radius_km: float) -> list[tuple[float, ServiceModel]]:
+        """
+        All services within radius_km, as (distance_km, service) in catalog-bucket order.
+        """
+        out: list[tuple[float, ServiceModel]] = []
+        for bucket in self._cells_around(lat, lng, radius_km):
+            for s in bucket:
+                d = DistanceCalculator.haversine(lat, lng, s.lat, s.lng)
+                if d <= radius_km:
+                    out.append((d, s))
+        return out
+
+    def nearest(
+        self, lat: float, lng: float, k: int, max_distance_km: float
+    ) -> list[tuple[float, ServiceModel]]:
+        """
+        The k nearest services within max_distance_km, closest first.
+        """
+        return heapq.nsmallest(k, self.within(lat, lng, max_distance_km), key=lambda x: x[0])
+
+
+class ServiceSpatialIndex:
+    """
+    One GridSpatialIndex per service type, built once from ServiceSource.load_services().
+    """
+
+    def __init__(self, services: Iterable[ServiceModel], cell_km: float = 2.0):
+        by_type: dict[str, list[ServiceModel]] = defaultdict(list)
+        for s in services:
+            by_type[s.type].append(s)
+
+        self.cell_km = cell_km
+        self._by_type = {t: GridSpatialIndex(items, cell_km) for t, items in by_type.items()}
+
+    @property
+    def service_types(self) -> list[str]:
+        return list(self._by_type)
+
+    def within(
+        self, service_type: str, lat: float, lng: float, radius_km: float
+    ) -> list[tuple[float, ServiceModel]]:
+        index = self._by_type.get(service_type)
+        if index is None:
+            return []
+        return index.within(lat, lng, radius_km)
+
+    def nearest(
+        self, service_type: str, lat: float, lng: float, k: int, max_distance_km: float
+    ) -> list[tuple[float, ServiceModel]]:
+        index = self._by_type.get(service_type)
+        if index is None:
+            return []
+        return index.nearest(lat, lng, k, max_distance_km)
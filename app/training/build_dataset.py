@@ -1,18 +1,52 @@
 from __future__ import annotations
 
+import argparse
 import json
+import shutil
+import tempfile
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
 
+from app.data.mock_service_source import MockServiceSource
+from app.features.feature_config import FeatureConfig
+from app.features.feature_store import StaticFeatureStore, get_feature_store
+from app.training.event_reader import (
+    PARSE_WORKERS,
+    complete_end,
+    iter_event_chunks,
+    iter_parsed_ranges,
+    read_log_parallel,
+)
+from app.training.watermarks import CommitJournal, WatermarkStore, log_segments
 
 LOG_PATH = Path("data/reco_events.jsonl")
+SHADOW_LOG_PATH = Path("data/reco_shadow.jsonl")  # written by ShadowScorer (RECO_SHADOW_ML=1)
 OUT_DIR = Path("data/datasets")
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
+# --stream mode: events parsed per chunk; peak memory ~ chunk size, not log size
+STREAM_CHUNK_EVENTS = 50_000
+STREAM_DATASET_NAME = "reco_training"  # OUT_DIR/reco_training/date=.../service_type=.../*.parquet
+PARTITION_COLS = ["date", "service_type"]
+STREAM_FEATURES = ["rating_norm", "distance_closeness", "open_now"]
+# --incremental: per-segment read positions, stored inside the dataset dir (ignored by parquet readers)
+WATERMARK_FILE = "_watermarks.json"
+# pending publish of an incremental run (see CommitJournal); only present while committing
+COMMIT_FILE = "_commit.json"
+# a click only labels an impression shown at most this long before it
+ATTRIBUTION_WINDOW_HOURS = 24.0
+# string columns with at most this many distinct values per row become categoricals
+CATEGORY_MAX_RATIO = 0.5
+# share of click-less requests kept (1.0 = no downsampling); kept ones get sample_weight 1/rate
+NEGATIVE_SAMPLE_RATE = 1.0
+# 16-char hash key: independent of the default-key hash train_ranker's holdout split uses
+_SAMPLE_HASH_KEY = "reco-negsample-1"
+
 
 def _parse_iso(ts: str) -> datetime:
     return datetime.fromisoformat(ts)
@@ -59,6 +93,7 @@ class ImpressionRow:
     is_available: Optional[bool]
     status: Optional[str]
     features: Dict[str, float]
+    feature_store_key: Optional[str] = None  # logged by serving; None in older logs
 
 
 @dataclass
@@ -127,6 +162,7 @@ def split_events(events: List[Dict[str, Any]]) -> Tuple[List[ImpressionRow], Lis
                         is_available=item.get("is_available"),
                         status=item.get("status"),
                         features=item.get("features") or {},
+                        feature_store_key=ctx.get("feature_store_key"),
                     )
                 )
 
@@ -150,7 +186,11 @@ def split_events(events: List[Dict[str, Any]]) -> Tuple[List[ImpressionRow], Lis
     return impressions, clicks
 
 
-def build_training_dataframe(impressions: List[ImpressionRow], clicks: List[ClickRow]) -> pd.DataFrame:
+def build_training_dataframe(
+    impressions: List[ImpressionRow],
+    clicks: List[ClickRow],
+    window_hours: float = ATTRIBUTION_WINDOW_HOURS,
+) -> pd.DataFrame:
     imp_df = pd.DataFrame([vars(x) for x in impressions])
     clk_df = pd.DataFrame([vars(x) for x in clicks])
 
@@ -159,41 +199,9 @@ def build_training_dataframe(impressions: List[ImpressionRow], clicks: List[Clic
 
     # If no clicks yet, labels are all 0
     if clk_df.empty:
-        imp_df["label_clicked"] = 0
+        imp_df["label_clicked"] = np.zeros(len(imp_df), dtype=np.int8)
     else:
-        # ✅ Prefer request_id join if we have it in BOTH impressions and clicks
-        have_request_id = (
-            "request_id" in imp_df.columns
-            and "request_id" in clk_df.columns
-            and imp_df["request_id"].notna().any()
-            and clk_df["request_id"].notna().any()
-        )
-
-        if have_request_id:
-            clk_pairs = set(
-                zip(
-                    clk_df["request_id"].astype(str),
-                    clk_df["clicked_service_id"].astype(int),
-                )
-            )
-
-            imp_df["label_clicked"] = [
-                1 if (str(rid), int(sid)) in clk_pairs else 0
-                for rid, sid in zip(imp_df["request_id"], imp_df["service_id"])
-            ]
-        else:
-            # fallback heuristic join (old logs)
-            clk_pairs = set(
-                zip(
-                    clk_df["session_key"].astype(str),
-                    clk_df["clicked_service_id"].astype(int),
-                )
-            )
-
-            imp_df["label_clicked"] = [
-                1 if (str(sk), int(sid)) in clk_pairs else 0
-                for sk, sid in zip(imp_df["session_key"], imp_df["service_id"])
-            ]
+        imp_df["label_clicked"] = join_click_labels(imp_df, clk_df, window_hours)
 
     # Expand features dict into columns
     feat_df = pd.json_normalize(imp_df["features"]).add_prefix("f_")
@@ -213,26 +221,612 @@ def build_training_dataframe(impressions: List[ImpressionRow], clicks: List[Clic
         if c not in out.columns:
             out[c] = 0.0
 
+    return compact_dtypes(out)
+
+
+def join_click_labels(
+    imp_df: pd.DataFrame, clk_df: pd.DataFrame, window_hours: float = ATTRIBUTION_WINDOW_HOURS
+) -> np.ndarray:
+    """
+    Label join for the in-memory build, with the same attribution as the streaming build
+    (label_frame): (request_id, service_id) within window_hours of the request, or
+    (session_key, service_id) for old impressions without a request_id.
+    Returns int8 labels in imp_df order.
+    """
+    rows = imp_df[["request_id", "session_key", "service_id", "request_time"]].astype({"service_id": np.int64})
+    rows["request_time"] = pd.to_datetime(rows["request_time"], format="ISO8601")
+    clk = clk_df.rename(columns={"clicked_service_id": "service_id"})
+    clk["service_id"] = clk["service_id"].astype(np.int64)
+    clk["event_ts"] = pd.to_datetime(clk["event_ts"], format="ISO8601")
+    return label_frame(rows, clk, window_hours).to_numpy()
+
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Training-frame memory diet: repeated strings -> category, bool-ish -> boolean,
+    numerics downcast to the smallest int / float32 that holds them.
+    """
+    out = df.copy()
+    for c in out.columns:
+        col = out[c]
+        if pd.api.types.is_datetime64_any_dtype(col):
+            continue
+        if col.dtype == object or pd.api.types.is_string_dtype(col):
+            values = col.dropna()
+            if col.dtype == object and len(values) and values.map(type).eq(bool).all():
+                out[c] = col.astype("boolean")
+            elif len(col) and col.nunique(dropna=True) <= CATEGORY_MAX_RATIO * len(col):
+                out[c] = col.astype("category")
+        elif pd.api.types.is_bool_dtype(col):
+            continue
+        elif pd.api.types.is_integer_dtype(col):
+            out[c] = pd.to_numeric(col, downcast="integer")
+        elif pd.api.types.is_float_dtype(col):
+            out[c] = pd.to_numeric(col, downcast="float")
+    return out
+
+
+def request_keys(df: pd.DataFrame) -> pd.Series:
+    """One key per served list: request_id, or session_key + request_time for old rows."""
+    fallback = df["session_key"].astype("string") + "|" + df["request_time"].astype("string")
+    return df["request_id"].astype("string").fillna(fallback).fillna("")
+
+
+def downsample_negatives(df: pd.DataFrame, rate: float) -> pd.DataFrame:
+    """
+    Per-request negative downsampling. Requests with a click are kept whole (weight 1);
+    click-less requests are kept whole with probability rate and weight 1/rate, so weighted
+    counts (and probabilities fit on them) match the full data. The keep decision is a hash
+    of the request key: stable across chunks, reruns and incremental builds.
+    Always adds sample_weight (all 1.0 when rate >= 1).
+    """
+    if rate >= 1.0 or df.empty:
+        return df.assign(sample_weight=np.ones(len(df), dtype=np.float32))
+
+    key = request_keys(df)
+    clicked = df["label_clicked"].fillna(0).astype(bool).groupby(key.to_numpy()).transform("max").to_numpy()
+    bucket = pd.util.hash_pandas_object(key, index=False, hash_key=_SAMPLE_HASH_KEY).to_numpy() % 10_000
+    keep = clicked | (bucket < int(rate * 10_000))
+
+    out = df[keep].copy()
+    out["sample_weight"] = np.where(clicked[keep], 1.0, 1.0 / rate).astype(np.float32)
+    return out
+
+
+def load_feature_store(config: Optional[FeatureConfig] = None) -> StaticFeatureStore:
+    """Same (catalog version, config) store the serving engine uses."""
+    source = MockServiceSource()
+    return get_feature_store(source.load_services(), config or FeatureConfig(), source.catalog_version())
+
+
+def attach_static_features(df: pd.DataFrame, store: StaticFeatureStore) -> pd.DataFrame:
+    """
+    Fills the request-independent feature columns (f_rating_norm, ...) from the store, but only
+    on rows whose logged feature_store_key is this store's: the values the model was served.
+    Rows from other catalog versions / configs, or from logs without a key, keep what was
+    logged -- today's catalog would leak later ratings into older impressions.
+    """
+    out = df.copy()
+    if "feature_store_key" not in out.columns:
+        out["feature_store_key"] = pd.Series(pd.NA, index=out.index, dtype="string")
+    match = (out["feature_store_key"].astype("string") == "|".join(store.key)).fillna(False).to_numpy(dtype=bool)
+    if not match.any():
+        return out
+    ids = out.loc[match, "service_id"].astype(int)
+    for name in ("rating_norm",):
+        col = f"f_{name}"
+        stored = pd.Series(store.column(name, ids), index=ids.index)
+        out.loc[match, col] = stored.fillna(out.loc[match, col]).astype(out[col].dtype)
     return out
 
 
-def main() -> None:
-    events = read_events(LOG_PATH)
-    impressions, clicks = split_events(events)
+SHADOW_COLS = ["request_id", "service_id", "shadow_model_version", "shadow_ml_score", "shadow_ml_rank", "shadow_rank_delta"]
+
+
+def shadow_columns(events: List[Dict[str, Any]]) -> Dict[str, list]:
+    """shadow_ml_score events -> one entry per scored item, plus the event's date/service_type."""
+    cols: Dict[str, list] = {n: [] for n in SHADOW_COLS + PARTITION_COLS}
+    for e in events:
+        if e.get("event_type") != "shadow_ml_score":
+            continue
+        for item in e.get("items", []):
+            cols["request_id"].append(e.get("request_id"))
+            cols["service_id"].append(int(item["service_id"]))
+            cols["shadow_model_version"].append(e.get("model_version"))
+            cols["shadow_ml_score"].append(item.get("ml_score"))
+            cols["shadow_ml_rank"].append(item.get("ml_rank"))
+            cols["shadow_rank_delta"].append(item.get("rank_delta"))
+            cols["date"].append(str(e.get("timestamp", ""))[:10])
+            cols["service_type"].append(e.get("service_type"))
+    return cols
+
+
+def _shadow_frame(cols: Dict[str, list]) -> pd.DataFrame:
+    df = pd.DataFrame(cols)
+    df["request_id"] = df["request_id"].astype("string")
+    df["service_id"] = df["service_id"].astype(np.int64)
+    df["shadow_model_version"] = df["shadow_model_version"].astype("string")
+    df["shadow_ml_score"] = pd.to_numeric(df["shadow_ml_score"], errors="coerce").astype(np.float64)
+    for c in ("shadow_ml_rank", "shadow_rank_delta"):
+        df[c] = pd.to_numeric(df[c], errors="coerce").astype("Int64")
+    return df
+
+
+def read_shadow_scores(path: Path) -> pd.DataFrame:
+    """
+    One row per (request_id, service_id) from the shadow ML log.
+    Empty frame if shadow mode never ran.
+    """
+    if not path.exists():
+        return pd.DataFrame(columns=SHADOW_COLS)
+    frames = [_shadow_frame(shadow_columns(chunk)) for chunk in iter_event_chunks(path, STREAM_CHUNK_EVENTS, ["shadow_ml_score"])]
+    df = pd.concat(frames, ignore_index=True) if frames else _shadow_frame(shadow_columns([]))
+    return df[SHADOW_COLS].drop_duplicates(subset=["request_id", "service_id"], keep="last")
+
+
+class ShadowScoreSpill:
+    """
+    Shadow scores for the streaming build without holding the shadow log in memory.
+    The log is streamed once into a temporary parquet dataset partitioned like the training
+    data (date, service_type of the scoring time); each impression chunk then reads back only
+    the partitions it can match (its dates + the next day, since scoring runs just after the
+    request) filtered to its own request_ids.
+    """
+
+    def __init__(self, log_path: Path, spill_dir: Path, chunk_size: int = STREAM_CHUNK_EVENTS):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+
+        self.spill_dir = spill_dir
+        self.dataset = None
+        wrote = False
+        if log_path.exists():
+            for i, chunk in enumerate(iter_event_chunks(log_path, chunk_size, ["shadow_ml_score"])):
+                df = _shadow_frame(shadow_columns(chunk))
+                if df.empty:
+                    continue
+                pq.write_to_dataset(
+                    pa.Table.from_pandas(df, preserve_index=False),
+                    root_path=str(spill_dir),
+                    partition_cols=PARTITION_COLS,
+                    basename_template=f"part-{i:06d}-{{i}}.parquet",  # sorted = log order
+                    existing_data_behavior="overwrite_or_ignore",
+                )
+                wrote = True
+        if wrote:
+            partitioning = ds.partitioning(
+                pa.schema([("date", pa.string()), ("service_type", pa.string())]), flavor="hive"
+            )
+            self.dataset = ds.dataset(str(spill_dir), format="parquet", partitioning=partitioning)
+
+    def __bool__(self) -> bool:
+        return self.dataset is not None
+
+    def lookup(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Shadow rows for the requests in df (deduplicated, last score wins)."""
+        import pyarrow.dataset as ds
+
+        ids = df["request_id"].dropna().astype(str).unique().tolist()
+        if self.dataset is None or not ids:
+            return _shadow_frame(shadow_columns([]))[SHADOW_COLS]
+        days = pd.to_datetime(df["request_time"]).dt.normalize().dropna().unique()
+        dates = sorted({d.strftime("%Y-%m-%d") for day in days for d in (day, day + pd.Timedelta(days=1))})
+        table = self.dataset.to_table(
+            columns=SHADOW_COLS,
+            filter=(
+                ds.field("date").isin(dates)
+                & ds.field("service_type").isin(df["service_type"].dropna().astype(str).unique().tolist())
+                & ds.field("request_id").isin(ids)
+            ),
+        )
+        out = _shadow_frame(table.to_pandas().to_dict("list"))[SHADOW_COLS]
+        return out.drop_duplicates(subset=["request_id", "service_id"], keep="last")
+
+    def close(self) -> None:
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+
+def attach_shadow_scores(df: pd.DataFrame, shadow_df: pd.DataFrame) -> pd.DataFrame:
+    """Left-join shadow ML scores onto impression rows (NaN where the request wasn't shadowed)."""
+    if shadow_df.empty or "request_id" not in df.columns:
+        return df
+    return df.merge(shadow_df, on=["request_id", "service_id"], how="left")
+
+
+# ---------------------------------------------------------------------------
+# Streaming build (--stream): two passes over the log, bounded memory
+#   1) collect clicks (a small fraction of the log)
+#   2) parse impressions chunk by chunk straight into columns, label, write parquet
+# --incremental reads only the bytes past each segment's watermark.
+# ---------------------------------------------------------------------------
+
+# (segment, start offset, end offset)
+LogRange = Tuple[Path, int, int]
+
+
+def click_columns(events: List[Dict[str, Any]]) -> Dict[str, list]:
+    cols: Dict[str, list] = {"request_id": [], "session_key": [], "service_id": [], "service_type": [], "event_ts": []}
+    for e in events:
+        ctx = e.get("context") or {}
+        cols["request_id"].append(ctx.get("request_id"))
+        cols["session_key"].append(make_session_key(ctx))
+        cols["service_id"].append(int((e.get("clicked") or {}).get("service_id")))
+        cols["service_type"].append(str(ctx.get("service_type") or "unknown"))
+        cols["event_ts"].append(e["timestamp"])
+    return cols
+
+
+def collect_clicks(ranges: List[LogRange], workers: int = PARSE_WORKERS) -> pd.DataFrame:
+    """
+    Pass 1: every click in the ranges (a small fraction of the log).
+    """
+    frames = [
+        read_log_parallel(path, ["recommendation_click"], click_columns, start, end, workers)
+        for path, start, end in ranges
+    ]
+    clicks = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(click_columns([]))
+    clicks["event_ts"] = pd.to_datetime(clicks["event_ts"], format="ISO8601")
+    return clicks
+
+
+def impression_columns(events: List[Dict[str, Any]]) -> Dict[str, list]:
+    """
+    Flattens impression events straight into column lists, one entry per recommended item
+    (same fields as ImpressionRow, features already expanded to f_* columns).
+    """
+    names = [
+        "request_id", "session_key", "user_id", "service_type", "user_lat", "user_lng",
+        "request_time", "event_ts", "service_id", "position", "score", "distance_km",
+        "is_available", "status", "feature_store_key",
+    ] + [f"f_{k}" for k in STREAM_FEATURES]
+    cols: Dict[str, list] = {n: [] for n in names}
+
+    for e in events:
+        ctx = e.get("context") or {}
+        rid = ctx.get("request_id")
+        sk = make_session_key(ctx)
+        user_id = str(ctx.get("user_id") or "anon")
+        service_type = str(ctx.get("service_type") or "unknown")
+        user_lat = float(ctx.get("user_lat") or 0.0)
+        user_lng = float(ctx.get("user_lng") or 0.0)
+        rt_raw = ctx.get("request_time")
+        request_time = rt_raw if isinstance(rt_raw, str) and rt_raw else e["timestamp"]
+        store_key = ctx.get("feature_store_key")
+
+        for pos, item in enumerate(e.get("recommended", [])):
+            cols["request_id"].append(rid)
+            cols["session_key"].append(sk)
+            cols["user_id"].append(user_id)
+            cols["service_type"].append(service_type)
+            cols["user_lat"].append(user_lat)
+            cols["user_lng"].append(user_lng)
+            cols["request_time"].append(request_time)
+            cols["event_ts"].append(e["timestamp"])
+            cols["service_id"].append(int(item["service_id"]))
+            cols["position"].append(pos)
+            cols["score"].append(item.get("score"))
+            cols["distance_km"].append(item.get("distance_km"))
+            cols["is_available"].append(item.get("is_available"))
+            cols["status"].append(item.get("status"))
+            cols["feature_store_key"].append(store_key)
+            feats = item.get("features") or {}
+            for k in STREAM_FEATURES:
+                cols[f"f_{k}"].append(feats.get(k))
+
+    return cols
+
+
+def label_frame(df: pd.DataFrame, clicks: pd.DataFrame, window_hours: float) -> pd.Series:
+    """
+    label_clicked per impression row. Rows with a request_id join clicks on
+    (request_id, service_id), counted only if the click came within window_hours;
+    old rows without one fall back to (session_key, service_id).
+    """
+    label = np.zeros(len(df), dtype=np.int8)
+    if clicks.empty:
+        return pd.Series(label, index=df.index)
+
+    rows = df[["request_id", "session_key", "service_id", "request_time"]].reset_index(drop=True)
+    rows["row"] = np.arange(len(rows))
+    has_rid = rows["request_id"].notna()
+
+    by_rid = rows[has_rid].merge(
+        clicks[clicks["request_id"].notna()][["request_id", "service_id", "event_ts"]],
+        on=["request_id", "service_id"],
+    )
+    window = pd.Timedelta(hours=window_hours)
+    by_rid = by_rid[(by_rid["event_ts"] >= by_rid["request_time"]) & (by_rid["event_ts"] <= by_rid["request_time"] + window)]
+    label[by_rid["row"].to_numpy()] = 1
+
+    by_sk = rows[~has_rid].merge(clicks[["session_key", "service_id"]], on=["session_key", "service_id"])
+    label[by_sk["row"].to_numpy()] = 1
+    return pd.Series(label, index=df.index)
+
+
+def _stream_frame(
+    cols: Union[Dict[str, list], pd.DataFrame],
+    clicks: pd.DataFrame,
+    window_hours: float,
+    store: StaticFeatureStore,
+    shadow: Optional[ShadowScoreSpill],
+    negative_rate: float = NEGATIVE_SAMPLE_RATE,
+) -> pd.DataFrame:
+    df = pd.DataFrame(cols)
+    df["event_ts"] = pd.to_datetime(df["event_ts"], format="ISO8601")
+    df["request_time"] = pd.to_datetime(df["request_time"], format="ISO8601")
+    df["label_clicked"] = label_frame(df, clicks, window_hours)
+    # a chunk holds whole impression events, so every request is sampled as a unit
+    df = downsample_negatives(df, negative_rate)
+    df["hour"] = df["request_time"].dt.hour.astype(np.int8)
+    df["dayofweek"] = df["request_time"].dt.dayofweek.astype(np.int8)
+    df["date"] = df["request_time"].dt.strftime("%Y-%m-%d")
+
+    df = attach_static_features(df, store)
+    if shadow:
+        # always merge (even with no matches) so every chunk writes the same columns
+        df = df.merge(shadow.lookup(df), on=["request_id", "service_id"], how="left")
+
+    # fixed dtypes so every chunk writes the same parquet schema (all-null chunks included)
+    for c in ("request_id", "session_key", "user_id", "status", "feature_store_key", "shadow_model_version"):
+        if c in df.columns:
+            df[c] = df[c].astype("string")
+    df["is_available"] = df["is_available"].astype("boolean")
+    for c in ["score", "distance_km"] + [f"f_{k}" for k in STREAM_FEATURES]:
+        df[c] = pd.to_numeric(df[c], errors="coerce").astype(np.float64)
+    return df
+
+
+def apply_late_clicks(
+    root: Path, clicks: pd.DataFrame, window_hours: float
+) -> Tuple[int, List[Tuple[Path, Path]], List[Path]]:
+    """
+    Sets label_clicked=1 on impressions already written by earlier runs, for clicks whose
+    impression (same request_id + service_id) happened at most window_hours before the click.
+    Only the date partitions the window can reach are read. Each changed partition is rewritten
+    to one hidden merged part; nothing visible changes until CommitJournal.commit.
+    Returns (labels flipped, [(hidden merged part, published name)], old parts to remove).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    clicks = clicks[clicks["request_id"].notna()]
+    if clicks.empty:
+        return 0, [], []
+    window = pd.Timedelta(hours=window_hours)
+
+    # partition -> clicks that may point into it
+    targets: Dict[Tuple[str, str], List[int]] = {}
+    for i, (stype, ts) in enumerate(zip(clicks["service_type"], clicks["event_ts"])):
+        for day in pd.date_range((ts - window).normalize(), ts.normalize(), freq="D"):
+            targets.setdefault((day.strftime("%Y-%m-%d"), stype), []).append(i)
+
+    flipped = 0
+    publish: List[Tuple[Path, Path]] = []
+    remove: List[Path] = []
+    for (day, stype), idx in targets.items():
+        part_dir = root / f"date={day}" / f"service_type={stype}"
+        # published parts only: this run's staged parts are labelled with every click already
+        files = sorted(f for f in part_dir.glob("*.parquet") if not f.name.startswith("."))
+        if not files:
+            continue
+        table = pa.concat_tables([pq.read_table(f) for f in files])
+
+        imp = pd.DataFrame({
+            "request_id": table.column("request_id").to_pandas(),
+            "service_id": table.column("service_id").to_pandas(),
+            "request_time": table.column("request_time").to_pandas(),
+        })
+        imp["row"] = np.arange(len(imp))
+        hits = imp.merge(clicks.iloc[idx][["request_id", "service_id", "event_ts"]], on=["request_id", "service_id"])
+        hits = hits[(hits["request_time"] <= hits["event_ts"]) & (hits["request_time"] >= hits["event_ts"] - window)]
+
+        label = table.column("label_clicked").to_numpy().copy()
+        rows = hits["row"].to_numpy()
+        new = int((label[rows] == 0).sum()) if rows.size else 0
+        if new == 0:
+            continue
+        label[rows] = 1
+        col = table.schema.get_field_index("label_clicked")
+        table = table.set_column(col, table.schema.field(col), pa.array(label, type=table.schema.field(col).type))
+
+        # hidden until the commit publishes it and removes the parts it replaces
+        tmp = part_dir / f".part-merged-{datetime.utcnow():%Y%m%dT%H%M%S%f}.parquet"
+        pq.write_table(table, tmp)
+        publish.append((tmp, part_dir / tmp.name[1:]))
+        remove.extend(files)
+        flipped += new
+
+    return flipped, publish, remove
+
+
+def read_training_frame(
+    log_path: Path = LOG_PATH,
+    attribution_hours: float = ATTRIBUTION_WINDOW_HOURS,
+    workers: int = PARSE_WORKERS,
+) -> pd.DataFrame:
+    """
+    Labelled impressions for the in-memory (CSV) build. Same columns and labels as
+    build_training_dataframe, but the log is parsed over byte ranges in a process pool
+    (read_log_parallel) straight into columns, with --stream's flatteners.
+    """
+    if not log_path.exists():
+        raise FileNotFoundError(f"Log file not found: {log_path}")
+    end = complete_end(log_path)
+    clicks = collect_clicks([(log_path, 0, end)], workers)
+    df = read_log_parallel(log_path, ["recommendation_impression"], impression_columns, 0, end, workers)
+    if df.empty:
+        raise RuntimeError("No impression events found. Call /api/recommend first to generate logs.")
+
+    df["event_ts"] = pd.to_datetime(df["event_ts"], format="ISO8601")
+    df["request_time"] = pd.to_datetime(df["request_time"], format="ISO8601")
+    df["label_clicked"] = label_frame(df, clicks, attribution_hours)
+    df["hour"] = df["request_time"].dt.hour
+    df["dayofweek"] = df["request_time"].dt.dayofweek
+    return compact_dtypes(df)
+
+
+def build_dataset_streaming(
+    log_path: Path = LOG_PATH,
+    out_dir: Path = OUT_DIR,
+    chunk_size: int = STREAM_CHUNK_EVENTS,
+    incremental: bool = False,
+    attribution_hours: float = ATTRIBUTION_WINDOW_HOURS,
+    workers: int = 1,
+    negative_rate: float = NEGATIVE_SAMPLE_RATE,
+) -> Tuple[Path, int, int]:
+    """
+    Writes OUT_DIR/reco_training/ as parquet partitioned by date and service_type.
+    Clicks label impressions shown at most attribution_hours before them.
+    incremental=True only reads log bytes past the stored watermarks, appends new parts and
+    back-fills labels for late clicks; otherwise the dataset is rebuilt from scratch.
+    New parts, late-click rewrites and watermarks become visible together (CommitJournal), so a
+    run that crashes part way neither loses nor duplicates rows.
+    Memory: workers=1 holds one chunk of chunk_size events. workers>1 parses whole byte ranges
+    in parallel and holds up to 2 x workers ranges of PARSE_RANGE_BYTES each (chunk_size is
+    not used for impressions then).
+    negative_rate < 1 keeps that share of click-less requests (see downsample_negatives); a
+    kept request later flipped by a late click keeps its 1/rate weight, which is still unbiased.
+    Returns (dataset dir, rows written, late labels flipped).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    root = out_dir / STREAM_DATASET_NAME
+    if not incremental and root.exists():
+        shutil.rmtree(root)  # full rebuild
+    root.mkdir(parents=True, exist_ok=True)
+
+    journal = CommitJournal(root / COMMIT_FILE, root / WATERMARK_FILE)
+    journal.recover(root)
+    marks = WatermarkStore(root / WATERMARK_FILE)
+
+    # every segment gets its mark re-filed at the end, even without new bytes (rotation renames)
+    positions: List[LogRange] = []
+    for seg in log_segments(log_path):
+        start = marks.resume_offset(seg)
+        positions.append((seg, start, complete_end(seg, start)))
+    ranges = [(seg, start, end) for seg, start, end in positions if end > start]
+    if not ranges and not len(marks) and not log_path.exists():
+        raise FileNotFoundError(f"Log file not found: {log_path}")
+
+    clicks = collect_clicks(ranges, workers)
+    store = load_feature_store()
+    # dot-prefixed: ignored by parquet readers of the dataset root; removed when done
+    shadow = ShadowScoreSpill(SHADOW_LOG_PATH, Path(tempfile.mkdtemp(prefix=".shadow-", dir=root)), chunk_size)
+
+    run_id = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    rows = 0
+    try:
+        for r, (seg, start, end) in enumerate(ranges):
+            if workers > 1:
+                # line-aligned byte ranges parsed in a process pool, frames come back in file order
+                parts = iter_parsed_ranges(seg, ["recommendation_impression"], impression_columns, start, end, workers)
+            else:
+                parts = (
+                    impression_columns(chunk)
+                    for chunk in iter_event_chunks(seg, chunk_size, ["recommendation_impression"], start, end)
+                )
+            for i, cols in enumerate(parts):
+                if len(cols["service_id"]) == 0:
+                    continue
+                df = _stream_frame(cols, clicks, attribution_hours, store, shadow, negative_rate)
+                if df.empty:
+                    continue
+                pq.write_to_dataset(
+                    pa.Table.from_pandas(df, preserve_index=False),
+                    root_path=str(root),
+                    partition_cols=PARTITION_COLS,
+                    # staged hidden; published by the commit below
+                    basename_template=f".part-{run_id}-{r:03d}-{i:05d}-{{i}}.parquet",
+                    existing_data_behavior="overwrite_or_ignore",
+                )
+                rows += len(df)
+    finally:
+        shadow.close()
+
+    # clicks whose impressions were written by an earlier run
+    flipped, publish, remove = apply_late_clicks(root, clicks, attribution_hours) if incremental else (0, [], [])
+    publish += [(f, f.with_name(f.name[1:])) for f in root.rglob(f".part-{run_id}-*.parquet")]
+
+    for seg, _, end in positions:
+        marks.advance(seg, end)
+    journal.commit(publish, remove, marks)
+
+    return root, rows, flipped
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build the reco training dataset from event logs.")
+    parser.add_argument("--log", type=Path, default=LOG_PATH)
+    parser.add_argument("--out-dir", type=Path, default=OUT_DIR)
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="chunked build into partitioned parquet; memory bounded by --chunk-size",
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=STREAM_CHUNK_EVENTS, help="events per chunk (single-process parsing)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help=(
+            "processes parsing the log. Default: PARSE_WORKERS (env, else the core count) for the "
+            "in-memory build, 1 with --stream, which then parses in this process and keeps memory at "
+            "about --chunk-size events; N > 1 holds up to 2 x N byte ranges of PARSE_RANGE_BYTES "
+            "(env, 32 MiB) in flight and ignores --chunk-size"
+        ),
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="with --stream: only process log bytes added since the last run",
+    )
+    parser.add_argument(
+        "--attribution-hours", type=float, default=ATTRIBUTION_WINDOW_HOURS,
+        help="a click labels impressions shown at most this long before it",
+    )
+    parser.add_argument(
+        "--negative-rate", type=float, default=NEGATIVE_SAMPLE_RATE,
+        help="keep this share of requests without a click (weighted 1/rate); 1 keeps all",
+    )
+    args = parser.parse_args(argv)
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+
+    if args.incremental and not args.stream:
+        parser.error("--incremental requires --stream")
+    if not 0.0 < args.negative_rate <= 1.0:
+        parser.error("--negative-rate must be in (0, 1]")
+
+    # --stream keeps its memory bound by default; the in-memory build holds the whole log anyway
+    workers = args.workers if args.workers is not None else (1 if args.stream else PARSE_WORKERS)
+
+    if args.stream:
+        root, rows, flipped = build_dataset_streaming(
+            args.log, args.out_dir, args.chunk_size, args.incremental, args.attribution_hours, workers,
+            args.negative_rate,
+        )
+        print(f"✅ Built dataset with {rows} new rows ({flipped} labels updated by late clicks)")
+        print(f"✅ Wrote: {root}")
+        return
 
-    df = build_training_dataframe(impressions, clicks)
+    df = read_training_frame(args.log, args.attribution_hours, workers)
+    df = attach_static_features(df, load_feature_store())
+    df = attach_shadow_scores(df, read_shadow_scores(SHADOW_LOG_PATH))
+    n_all = len(df)
+    df = downsample_negatives(df, args.negative_rate)
 
-    csv_path = OUT_DIR / "reco_training.csv"
+    csv_path = args.out_dir / "reco_training.csv"
     df.to_csv(csv_path, index=False)
 
     # Optional parquet
     try:
-        pq_path = OUT_DIR / "reco_training.parquet"
+        pq_path = args.out_dir / "reco_training.parquet"
         df.to_parquet(pq_path, index=False)
     except Exception:
         pass
 
     print(f"✅ Built dataset with {len(df)} rows")
+    if len(df) < n_all:
+        print(f"Negative downsampling kept {len(df)}/{n_all} rows (rate {args.negative_rate})")
     print(f"✅ Wrote: {csv_path}")
 
 
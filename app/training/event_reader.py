@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+# parallel parsing: each worker gets a byte range of about this size (line-aligned)
+PARSE_RANGE_BYTES = int(os.getenv("PARSE_RANGE_BYTES", str(32 * 1024 * 1024)))
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "0")) or (os.cpu_count() or 1)
+
+# events -> column lists; must be a module-level function so it pickles into workers
+Flattener = Callable[[List[Dict[str, Any]]], Dict[str, list]]
+
+
+def complete_end(path: Path, start: int = 0) -> int:
+    """
+    Byte offset just past the last complete line (a writer may be mid-line at EOF).
+    """
+    size = path.stat().st_size
+    if size <= start:
+        return start
+    with path.open("rb") as f:
+        pos = size
+        while pos > start:
+            step = min(64 * 1024, pos - start)
+            f.seek(pos - step)
+            block = f.read(step)
+            nl = block.rfind(b"\n")
+            if nl != -1:
+                return pos - step + nl + 1
+            pos -= step
+    return start
+
+
+def iter_event_chunks(
+    path: Path,
+    chunk_size: int,
+    event_types: Optional[Sequence[str]] = None,
+    start: int = 0,
+    end: Optional[int] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Parsed events from bytes [start, end) of the file, in lists of at most chunk_size.
+    start must be at a line boundary; end defaults to the last complete line.
+    With event_types, other lines are skipped before json.loads (substring prefilter).
+    """
+    if not path.exists():
+        raise FileNotFoundError(f"Log file not found: {path}")
+    if end is None:
+        end = complete_end(path, start)
+    needles = [f'"{t}"'.encode() for t in event_types] if event_types else None
+
+    chunk: List[Dict[str, Any]] = []
+    with path.open("rb") as f:
+        f.seek(start)
+        pos = start
+        while pos < end:
+            line = f.readline()
+            if not line:
+                break
+            pos += len(line)
+            line = line.strip()
+            if not line:
+                continue
+            if needles and not any(n in line for n in needles):
+                continue
+            e = json.loads(line)
+            if event_types and e.get("event_type") not in event_types:
+                continue
+            chunk.append(e)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def split_byte_ranges(
+    path: Path, start: int = 0, end: Optional[int] = None, range_bytes: int = PARSE_RANGE_BYTES
+) -> List[Tuple[int, int]]:
+    """
+    Cuts [start, end) into consecutive ranges of about range_bytes, each ending on a newline.
+    """
+    if end is None:
+        end = complete_end(path, start)
+    ranges: List[Tuple[int, int]] = []
+    with path.open("rb") as f:
+        lo = start
+        while lo < end:
+            hi = lo + range_bytes
+            if hi >= end:
+                hi = end
+            else:
+                f.seek(hi - 1)
+                f.readline()  # to just past the newline at or after hi - 1
+                hi = min(f.tell(), end)
+            ranges.append((lo, hi))
+            lo = hi
+    return ranges
+
+
+def parse_range(
+    path: Path,
+    start: int,
+    end: int,
+    event_types: Optional[Sequence[str]],
+    flatten: Flattener,
+    chunk_size: int = 10_000,
+) -> pd.DataFrame:
+    """One byte range -> one columnar frame (runs in a worker process)."""
+    frames = [
+        pd.DataFrame(flatten(chunk))
+        for chunk in iter_event_chunks(path, chunk_size, event_types, start, end)
+    ]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(flatten([]))
+
+
+def iter_parsed_ranges(
+    path: Path,
+    event_types: Optional[Sequence[str]],
+    flatten: Flattener,
+    start: int = 0,
+    end: Optional[int] = None,
+    workers: int = PARSE_WORKERS,
+    range_bytes: int = PARSE_RANGE_BYTES,
+) -> Iterator[pd.DataFrame]:
+    """
+    Parses [start, end) of a JSONL log range by range and yields one frame per range,
+    in file order. With workers > 1 the ranges are parsed in a process pool; at most
+    2 x workers ranges are in flight, so memory stays bounded for any file size.
+    """
+    ranges = split_byte_ranges(path, start, end, range_bytes)
+    if workers <= 1 or len(ranges) <= 1:
+        for lo, hi in ranges:
+            yield parse_range(path, lo, hi, event_types, flatten)
+        return
+
+    # spawn: same reasoning as the sharded engine, safe from threaded parents
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), mp_context=ctx) as pool:
+        pending: deque = deque()
+        todo = iter(ranges)
+        for lo, hi in todo:
+            pending.append(pool.submit(parse_range, path, lo, hi, event_types, flatten))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            frame = pending.popleft().result()
+            nxt = next(todo, None)
+            if nxt is not None:
+                pending.append(pool.submit(parse_range, path, nxt[0], nxt[1], event_types, flatten))
+            yield frame
+
+
+def read_log_parallel(
+    path: Path,
+    event_types: Optional[Sequence[str]],
+    flatten: Flattener,
+    start: int = 0,
+    end: Optional[int] = None,
+    workers: int = PARSE_WORKERS,
+) -> pd.DataFrame:
+    """Whole range as one frame, rows in file order."""
+    frames = list(iter_parsed_ranges(path, event_types, flatten, start, end, workers))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(flatten([]))
@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.features.feature_config import FeatureConfig
+from app.services.ml_model_registry import MANIFEST_PATH, load_artifact
+from app.services.ml_ranker import predict_proba_matrix
+from app.training.build_dataset import (
+    ATTRIBUTION_WINDOW_HOURS,
+    LOG_PATH,
+    collect_clicks,
+    impression_columns,
+    label_frame,
+)
+from app.training.event_reader import (
+    PARSE_RANGE_BYTES,
+    PARSE_WORKERS,
+    complete_end,
+    iter_event_chunks,
+    split_byte_ranges,
+)
+
+REPLAY_KS = [1, 3]
+REPLAY_CHUNK_EVENTS = 20_000
+
+# Offline replay: every logged impression is re-ranked by each ranker and scored against the
+# clicks it actually got. Only the candidates that were shown can be re-ordered, so this
+# compares orderings of the served lists (no counterfactual candidates).
+
+
+@dataclass
+class ReplayStats:
+    requests: int = 0
+    requests_with_click: int = 0
+    candidates: int = 0
+    ndcg: Dict[int, float] = field(default_factory=dict)
+    hits: Dict[int, int] = field(default_factory=dict)
+    mrr: float = 0.0
+    scoring_seconds: float = 0.0
+
+    def merge(self, other: "ReplayStats") -> None:
+        self.requests += other.requests
+        self.requests_with_click += other.requests_with_click
+        self.candidates += other.candidates
+        self.mrr += other.mrr
+        self.scoring_seconds += other.scoring_seconds
+        for k, v in other.ndcg.items():
+            self.ndcg[k] = self.ndcg.get(k, 0.0) + v
+        for k, v in other.hits.items():
+            self.hits[k] = self.hits.get(k, 0) + v
+
+    def summary(self) -> Dict[str, Any]:
+        clicked = max(self.requests_with_click, 1)
+        out: Dict[str, Any] = {
+            "requests": self.requests,
+            "requests_with_click": self.requests_with_click,
+            "mrr": self.mrr / clicked,
+        }
+        for k in sorted(self.ndcg):
+            out[f"ndcg@{k}"] = self.ndcg[k] / clicked
+            # share of all replayed requests whose click lands in the top k
+            out[f"ctr@{k}"] = self.hits[k] / max(self.requests, 1)
+        secs = self.scoring_seconds
+        out["candidates_per_s"] = self.candidates / secs if secs > 0 else float("inf")
+        out["requests_per_s"] = self.requests / secs if secs > 0 else float("inf")
+        return out
+
+
+def rank_within_requests(group: np.ndarray, is_available: np.ndarray, score: np.ndarray) -> np.ndarray:
+    """
+    0-based rank of every row inside its request: open first, then higher score
+    (availability_rank_key), stable on logged order.
+    """
+    order = np.lexsort((-score, ~is_available, group))
+    starts = np.searchsorted(group[order], group[order], side="left")
+    rank = np.empty(len(group), dtype=np.int64)
+    rank[order] = np.arange(len(group)) - starts
+    return rank
+
+
+def request_metrics(group: np.ndarray, rank: np.ndarray, label: np.ndarray, ks: Sequence[int]) -> ReplayStats:
+    n_groups = int(group.max()) + 1 if len(group) else 0
+    stats = ReplayStats(requests=n_groups, candidates=len(group))
+    if n_groups == 0:
+        return stats
+
+    clicked = label.astype(bool)
+    n_clicked = np.bincount(group[clicked], minlength=n_groups)
+    has_click = n_clicked > 0
+    stats.requests_with_click = int(has_click.sum())
+
+    best = np.full(n_groups, np.inf)
+    np.minimum.at(best, group[clicked], rank[clicked])
+    stats.mrr = float((1.0 / (best[has_click] + 1.0)).sum())
+
+    gain = np.where(clicked, 1.0 / np.log2(rank + 2.0), 0.0)
+    for k in ks:
+        dcg = np.bincount(group, weights=np.where(rank < k, gain, 0.0), minlength=n_groups)
+        ideal_n = np.minimum(n_clicked, k)
+        discounts = np.concatenate([[0.0], np.cumsum(1.0 / np.log2(np.arange(k) + 2.0))])
+        idcg = discounts[ideal_n]
+        stats.ndcg[k] = float((dcg[has_click] / idcg[has_click]).sum())
+        stats.hits[k] = int((best < k).sum())
+    return stats
+
+
+# --- rankers: frame of one chunk's candidates -> one score per row ---
+
+Ranker = Callable[[pd.DataFrame], np.ndarray]
+
+
+def logged_ranker(df: pd.DataFrame) -> np.ndarray:
+    return -df["position"].to_numpy(dtype=np.float64)
+
+
+def rules_ranker(config: FeatureConfig) -> Ranker:
+    def score(df: pd.DataFrame) -> np.ndarray:
+        f = lambda c: df[c].fillna(0.0).to_numpy(dtype=np.float64)  # noqa: E731
+        return (
+            f("f_rating_norm") * config.weight_rating
+            + f("f_distance_closeness") * config.weight_distance
+            + f("f_open_now") * config.weight_open_now
+        )
+    return score
+
+
+def model_ranker(artifact: Dict[str, Any]) -> Ranker:
+    cols = list(artifact["feature_cols"])
+
+    def score(df: pd.DataFrame) -> np.ndarray:
+        # same inputs as serving (build_feature_matrix): logged features, position 0
+        X = np.zeros((len(df), len(cols)), dtype=np.float64)
+        for j, c in enumerate(cols):
+            if c == "hour":
+                X[:, j] = df["request_time"].dt.hour
+            elif c == "dayofweek":
+                X[:, j] = df["request_time"].dt.dayofweek
+            elif c != "position" and c in df.columns:
+                X[:, j] = df[c].fillna(0.0).to_numpy(dtype=np.float64)
+        return predict_proba_matrix(artifact, X)
+    return score
+
+
+# --- worker side ---
+
+_CLICKS: Optional[pd.DataFrame] = None
+_RANKERS: Dict[str, Ranker] = {}
+_OPTIONS: Dict[str, Any] = {}
+
+
+def _init_replay(clicks: pd.DataFrame, model_paths: Dict[str, str], options: Dict[str, Any]) -> None:
+    global _CLICKS, _RANKERS, _OPTIONS
+    _CLICKS = clicks
+    _OPTIONS = options
+    _RANKERS = {"logged": logged_ranker, "rules": rules_ranker(FeatureConfig())}
+    for name, path in model_paths.items():
+        _RANKERS[name] = model_ranker(load_artifact(Path(path)))
+
+
+def _replay_range(path: Path, start: int, end: int) -> Dict[str, ReplayStats]:
+    ks = _OPTIONS["ks"]
+    out = {name: ReplayStats() for name in _RANKERS}
+    chunks = iter_event_chunks(path, _OPTIONS["chunk_size"], ["recommendation_impression"], start, end)
+    for chunk in chunks:
+        df = pd.DataFrame(impression_columns(chunk))
+        if df.empty:
+            continue
+        df["request_time"] = pd.to_datetime(df["request_time"], format="ISO8601")
+        df["event_ts"] = pd.to_datetime(df["event_ts"], format="ISO8601")
+        label = label_frame(df, _CLICKS, _OPTIONS["attribution_hours"]).to_numpy()
+        # rows of one impression are contiguous and start at position 0
+        group = np.cumsum(df["position"].to_numpy() == 0) - 1
+        is_available = df["is_available"].fillna(False).to_numpy(dtype=bool)
+
+        for name, ranker in _RANKERS.items():
+            t0 = time.perf_counter()
+            score = ranker(df)
+            elapsed = time.perf_counter() - t0
+            stats = request_metrics(group, rank_within_requests(group, is_available, score), label, ks)
+            stats.scoring_seconds = elapsed
+            out[name].merge(stats)
+    return out
+
+
+# --- parent side ---
+
+def default_models() -> Dict[str, str]:
+    """The deployed artifact (manifest), preferring its portable form, if there is one."""
+    if not MANIFEST_PATH.exists():
+        return {}
+    manifest = json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+    name = manifest.get("portable") or manifest["artifact"]
+    return {f"model:{manifest.get('version', name)}": str(MANIFEST_PATH.parent / name)}
+
+
+def replay(
+    log_path: Path = LOG_PATH,
+    model_paths: Optional[Dict[str, str]] = None,
+    ks: Sequence[int] = REPLAY_KS,
+    workers: int = PARSE_WORKERS,
+    attribution_hours: float = ATTRIBUTION_WINDOW_HOURS,
+    chunk_size: int = REPLAY_CHUNK_EVENTS,
+    range_bytes: int = PARSE_RANGE_BYTES,
+) -> Tuple[Dict[str, ReplayStats], float]:
+    """
+    Replays the log through every ranker; returns (stats per ranker, wall seconds).
+    Byte ranges of the log are replayed in parallel; clicks are collected first and
+    shipped to each worker once.
+    """
+    t0 = time.perf_counter()
+    model_paths = default_models() if model_paths is None else model_paths
+    # up to the last complete line: a live log may end mid-write
+    clicks = collect_clicks([(log_path, 0, complete_end(log_path))], workers)
+    options = {"ks": list(ks), "attribution_hours": attribution_hours, "chunk_size": chunk_size}
+    ranges = split_byte_ranges(log_path, range_bytes=range_bytes)
+
+    parts: List[Dict[str, ReplayStats]]
+    if workers <= 1 or len(ranges) <= 1:
+        _init_replay(clicks, model_paths, options)
+        parts = [_replay_range(log_path, lo, hi) for lo, hi in ranges]
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(ranges)),
+            mp_context=ctx,
+            initializer=_init_replay,
+            initargs=(clicks, model_paths, options),
+        ) as pool:
+            parts = list(pool.map(_replay_range, [log_path] * len(ranges), *zip(*ranges)))
+
+    totals: Dict[str, ReplayStats] = {}
+    for part in parts:
+        for name, stats in part.items():
+            totals.setdefault(name, ReplayStats()).merge(stats)
+    return totals, time.perf_counter() - t0
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Replay logged impressions/clicks through rankers.")
+    parser.add_argument("--log", type=Path, default=LOG_PATH)
+    parser.add_argument(
+        "--model", action="append", default=None, metavar="PATH",
+        help="artifact (.pkl or .npz) to evaluate; repeatable. Default: the deployed model",
+    )
+    parser.add_argument("--k", type=int, nargs="+", default=REPLAY_KS)
+    parser.add_argument("--workers", type=int, default=PARSE_WORKERS)
+    parser.add_argument("--attribution-hours", type=float, default=ATTRIBUTION_WINDOW_HOURS)
+    parser.add_argument("--out", type=Path, default=None, help="also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    model_paths = None if args.model is None else {f"model:{Path(p).name}": p for p in args.model}
+    totals, wall = replay(args.log, model_paths, args.k, args.workers, args.attribution_hours)
+
+    report = {name: stats.summary() for name, stats in totals.items()}
+    any_stats = next(iter(totals.values()), ReplayStats())
+    print(f"✅ Replayed {any_stats.requests} requests ({any_stats.candidates} candidates) in {wall:.1f}s")
+    for name, summary in report.items():
+        metrics = " | ".join(
+            f"{key}: {value:.4f}" for key, value in summary.items()
+            if key.startswith(("ndcg", "ctr", "mrr"))
+        )
+        rate = summary["candidates_per_s"]
+        rate_txt = f"{rate:,.0f} cand/s" if math.isfinite(rate) else "n/a"
+        print(f"{name:<28} {metrics} | scoring: {rate_txt}")
+
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(
+            json.dumps({"log": str(args.log), "wall_seconds": wall, "rankers": report}, indent=2),
+            encoding="utf-8",
+        )
+        print(f"✅ Wrote: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
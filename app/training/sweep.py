@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from app.training.train_ranker import (
+    DATA_PATH,
+    FEATURE_COLS,
+    HOLDOUT_FRACTION,
+    PARQUET_DIR,
+    balanced_weights,
+    holdout_mask,
+    iter_parquet_batches,
+    row_weights,
+    save_artifact,
+)
+
+SWEEP_DIR = Path("data/sweep")
+MATRIX_NAMES = ("X_train", "y_train", "w_train", "X_test", "y_test", "w_test")
+
+# one entry per model family: every combination of the listed values is tried
+DEFAULT_GRID: Dict[str, Dict[str, List[Any]]] = {
+    "lr": {"C": [0.1, 1.0, 10.0]},
+    "sgd": {"alpha": [1e-5, 1e-4, 1e-3]},
+    "hgb": {"learning_rate": [0.05, 0.1], "max_leaf_nodes": [15, 31], "max_iter": [200]},
+}
+
+
+def expand_grid(grid: Dict[str, Dict[str, List[Any]]]) -> List[Dict[str, Any]]:
+    configs: List[Dict[str, Any]] = []
+    for family, params in grid.items():
+        names = sorted(params)
+        for values in itertools.product(*(params[n] for n in names)):
+            configs.append({"model": family, **dict(zip(names, values))})
+    return configs
+
+
+def make_model(config: Dict[str, Any]):
+    params = {k: v for k, v in config.items() if k != "model"}
+    family = config["model"]
+    if family == "lr":
+        return LogisticRegression(max_iter=200, **params)
+    if family == "sgd":
+        return Pipeline([
+            ("scaler", StandardScaler()),
+            ("clf", SGDClassifier(loss="log_loss", random_state=42, **params)),
+        ])
+    if family == "hgb":
+        return HistGradientBoostingClassifier(random_state=42, **params)
+    raise ValueError(f"unknown model family: {family!r}")
+
+
+def fit_weighted(model, m: Dict[str, np.ndarray]):
+    """Fits on the training matrix with class balance on weighted counts (see balanced_weights)."""
+    weight = balanced_weights(np.asarray(m["y_train"]), np.asarray(m["w_train"], dtype=np.float64))
+    if isinstance(model, Pipeline):
+        return model.fit(m["X_train"], m["y_train"], **{f"{model.steps[-1][0]}__sample_weight": weight})
+    return model.fit(m["X_train"], m["y_train"], sample_weight=weight)
+
+
+# --- feature matrices: built once, memory-mapped by every worker ---
+
+def _frames(source: str, data_path: Path, batch_rows: int):
+    if source == "parquet":
+        yield from iter_parquet_batches(data_path, batch_rows)
+    else:
+        yield from pd.read_csv(data_path, chunksize=batch_rows)
+
+
+def build_matrices(
+    source: str = "csv",
+    data_path: Optional[Path] = None,
+    out_dir: Path = SWEEP_DIR,
+    holdout: float = HOLDOUT_FRACTION,
+    batch_rows: int = 100_000,
+) -> Dict[str, Path]:
+    """
+    Writes X_train / y_train / w_train / X_test / y_test / w_test as .npy files (float64 C-order, the layout
+    sklearn fits on without copying). The split is by request hash, as in train_ranker --mode sgd.
+    """
+    data_path = data_path or (PARQUET_DIR if source == "parquet" else DATA_PATH)
+    if not data_path.exists():
+        raise FileNotFoundError(f"Dataset not found: {data_path}")
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    # pass 1: split sizes, so the memmaps can be allocated up front
+    n_train = n_test = 0
+    for df in _frames(source, data_path, batch_rows):
+        test = holdout_mask(df, holdout)
+        n_test += int(test.sum())
+        n_train += int(len(df) - test.sum())
+
+    paths = {name: out_dir / f"{name}.npy" for name in MATRIX_NAMES}
+    d = len(FEATURE_COLS)
+    arrays = {
+        "X_train": np.lib.format.open_memmap(paths["X_train"], mode="w+", dtype=np.float64, shape=(n_train, d)),
+        "y_train": np.lib.format.open_memmap(paths["y_train"], mode="w+", dtype=np.int8, shape=(n_train,)),
+        "w_train": np.lib.format.open_memmap(paths["w_train"], mode="w+", dtype=np.float32, shape=(n_train,)),
+        "X_test": np.lib.format.open_memmap(paths["X_test"], mode="w+", dtype=np.float64, shape=(n_test, d)),
+        "y_test": np.lib.format.open_memmap(paths["y_test"], mode="w+", dtype=np.int8, shape=(n_test,)),
+        "w_test": np.lib.format.open_memmap(paths["w_test"], mode="w+", dtype=np.float32, shape=(n_test,)),
+    }
+
+    # pass 2: fill
+    i_train = i_test = 0
+    for df in _frames(source, data_path, batch_rows):
+        test = holdout_mask(df, holdout)
+        X = df[FEATURE_COLS].fillna(0.0).to_numpy(dtype=np.float64)
+        y = df["label_clicked"].fillna(0).to_numpy(dtype=np.int8)
+        w = row_weights(df)
+        k = int((~test).sum())
+        arrays["X_train"][i_train:i_train + k] = X[~test]
+        arrays["y_train"][i_train:i_train + k] = y[~test]
+        arrays["w_train"][i_train:i_train + k] = w[~test]
+        i_train += k
+        k = int(test.sum())
+        arrays["X_test"][i_test:i_test + k] = X[test]
+        arrays["y_test"][i_test:i_test + k] = y[test]
+        arrays["w_test"][i_test:i_test + k] = w[test]
+        i_test += k
+
+    for a in arrays.values():
+        a.flush()
+    return paths
+
+
+def load_matrices(paths: Dict[str, Path]) -> Dict[str, np.ndarray]:
+    """Read-only memory maps: workers share the OS page cache instead of private copies."""
+    return {name: np.load(path, mmap_mode="r") for name, path in paths.items()}
+
+
+# --- workers ---
+
+def _init_worker() -> None:
+    # one process per config already uses every core; keep OpenMP/BLAS single-threaded
+    from threadpoolctl import threadpool_limits
+
+    threadpool_limits(1)
+
+
+def evaluate_config(config: Dict[str, Any], paths: Dict[str, Path]) -> Dict[str, Any]:
+    m = load_matrices(paths)
+    model = make_model(config)
+
+    t0 = time.perf_counter()
+    fit_weighted(model, m)
+    fit_seconds = time.perf_counter() - t0
+
+    y_test = np.asarray(m["y_test"])
+    if 0 < y_test.sum() < len(y_test):
+        proba = model.predict_proba(m["X_test"])[:, 1]
+        auc = float(roc_auc_score(y_test, proba, sample_weight=np.asarray(m["w_test"])))
+    else:
+        auc = float("nan")
+    return {"config": config, "auc": auc, "fit_seconds": fit_seconds}
+
+
+def run_sweep(
+    configs: List[Dict[str, Any]], paths: Dict[str, Path], workers: int
+) -> List[Dict[str, Any]]:
+    if workers <= 1:
+        return [evaluate_config(c, paths) for c in configs]
+    # spawn: same as the sharded engine and the log parser
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker) as pool:
+        return list(pool.map(evaluate_config, configs, itertools.repeat(paths)))
+
+
+def export_best(results: List[Dict[str, Any]], paths: Dict[str, Path]) -> Tuple[Dict[str, Any], Path]:
+    """Refits the best config on the training matrix and saves it like train_ranker does."""
+    scored = [r for r in results if not np.isnan(r["auc"])]
+    if not scored:
+        raise RuntimeError("No config produced a holdout AUC (holdout has a single class).")
+    best = max(scored, key=lambda r: r["auc"])
+
+    m = load_matrices(paths)
+    model = make_model(best["config"])
+    fit_weighted(model, m)
+    artifact = {
+        "model": model,
+        "feature_cols": FEATURE_COLS,
+        "sweep": {"config": best["config"], "holdout_auc": best["auc"]},
+    }
+    filename = {"lr": "reco_lr.pkl", "sgd": "reco_sgd.pkl", "hgb": "reco_hgb.pkl"}[best["config"]["model"]]
+    return best, save_artifact(artifact, filename)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep for the recommendation ranker.")
+    parser.add_argument("--source", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--data", type=Path, default=None, help="CSV file or parquet dataset dir")
+    parser.add_argument("--grid", type=Path, default=None, help='JSON {"family": {"param": [values]}}')
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--holdout", type=float, default=HOLDOUT_FRACTION)
+    parser.add_argument("--out-dir", type=Path, default=SWEEP_DIR)
+    parser.add_argument("--reuse-matrices", action="store_true", help="skip rebuilding the .npy files")
+    parser.add_argument("--no-export", action="store_true", help="report only, don't save the best model")
+    args = parser.parse_args(argv)
+
+    grid = json.loads(args.grid.read_text(encoding="utf-8")) if args.grid else DEFAULT_GRID
+    configs = expand_grid(grid)
+
+    paths = {name: args.out_dir / f"{name}.npy" for name in MATRIX_NAMES}
+    if not (args.reuse_matrices and all(p.exists() for p in paths.values())):
+        t0 = time.perf_counter()
+        paths = build_matrices(args.source, args.data, args.out_dir, args.holdout)
+        print(f"✅ Built feature matrices in {time.perf_counter() - t0:.1f}s -> {args.out_dir}")
+
+    m = load_matrices(paths)
+    print(f"Train rows: {len(m['y_train'])} | Holdout rows: {len(m['y_test'])} | Configs: {len(configs)}")
+
+    t0 = time.perf_counter()
+    results = run_sweep(configs, paths, min(args.workers, len(configs)))
+    print(f"✅ Swept {len(configs)} configs in {time.perf_counter() - t0:.1f}s")
+
+    for r in sorted(results, key=lambda r: -np.nan_to_num(r["auc"], nan=-1.0)):
+        print(f"AUC: {r['auc']:.4f} | fit: {r['fit_seconds']:6.2f}s | {json.dumps(r['config'])}")
+
+    results_path = args.out_dir / "results.json"
+    results_path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"✅ Wrote: {results_path}")
+
+    if not args.no_export:
+        best, out_path = export_best(results, paths)
+        print(f"✅ Best: {json.dumps(best['config'])} (AUC {best['auc']:.4f})")
+        print(f"✅ Saved model to: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,31 @@
 from __future__ import annotations
 
+import argparse
+import json
+import os
+import time
+import uuid
+from datetime import datetime
 from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
 import joblib
+import numpy as np
 import pandas as pd
 
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import roc_auc_score, accuracy_score
-from sklearn.linear_model import LogisticRegression
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from app.services.model_artifact import save_portable, to_portable
 
 
 DATA_PATH = Path("data/datasets/reco_training.csv")
+# partitioned output of `build_dataset --stream`
+PARQUET_DIR = Path("data/datasets/reco_training")
 MODEL_DIR = Path("models")
 MODEL_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -24,7 +40,30 @@ FEATURE_COLS = [
 ]
 
 
-def main() -> None:
+def row_weights(df: pd.DataFrame) -> np.ndarray:
+    """sample_weight from build_dataset --negative-rate; 1.0 for datasets built without it."""
+    if "sample_weight" not in df.columns:
+        return np.ones(len(df), dtype=np.float64)
+    return df["sample_weight"].fillna(1.0).to_numpy(dtype=np.float64)
+
+
+def balanced_weights(y: np.ndarray, sample_weight: np.ndarray) -> np.ndarray:
+    """
+    class_weight="balanced" computed on weighted counts, times the row weight. With all-1
+    weights this is exactly sklearn's "balanced"; with downsampled negatives it matches the
+    full data (sklearn's own "balanced" would count the sampled rows and over-weight them).
+    """
+    y = np.asarray(y)
+    total = sample_weight.sum()
+    per_class = {c: total / (2.0 * sample_weight[y == c].sum()) for c in (0, 1)}
+    return np.where(y == 1, per_class[1], per_class[0]) * sample_weight
+
+
+def load_training_split():
+    """
+    The CSV dataset as (df, X_train, X_test, y_train, y_test, w_train, w_test), stratified 75/25.
+    w_* are the per-row sample weights (see row_weights).
+    """
     if not DATA_PATH.exists():
         raise FileNotFoundError(f"Dataset not found: {DATA_PATH}. Run build_dataset first.")
 
@@ -42,20 +81,26 @@ def main() -> None:
 
     X = df[FEATURE_COLS].fillna(0.0)
     y = df["label_clicked"].astype(int)
+    w = row_weights(df)
 
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.25, random_state=42, stratify=y
+    X_train, X_test, y_train, y_test, w_train, w_test = train_test_split(
+        X, y, w, test_size=0.25, random_state=42, stratify=y
     )
+    return df, X_train, X_test, y_train, y_test, w_train, w_test
+
+
+def train_batch() -> None:
+    df, X_train, X_test, y_train, y_test, w_train, w_test = load_training_split()
 
-    model = LogisticRegression(max_iter=200, class_weight="balanced")
-    model.fit(X_train, y_train)
+    model = LogisticRegression(max_iter=200)
+    model.fit(X_train, y_train, sample_weight=balanced_weights(y_train, w_train))
 
-    # Evaluate
+    # Evaluate (weighted: downsampled negatives count as the rows they stand for)
     proba = model.predict_proba(X_test)[:, 1]
     preds = (proba >= 0.5).astype(int)
 
-    auc = roc_auc_score(y_test, proba)
-    acc = accuracy_score(y_test, preds)
+    auc = roc_auc_score(y_test, proba, sample_weight=w_test)
+    acc = accuracy_score(y_test, preds, sample_weight=w_test)
 
     print(f"✅ Trained Logistic Regression ranker")
     print(f"Rows: {len(df)} | Positives: {int(df['label_clicked'].sum())}")
@@ -66,9 +111,277 @@ def main() -> None:
         "model": model,
         "feature_cols": FEATURE_COLS,
     }
-    out_path = MODEL_DIR / "reco_lr.pkl"
-    joblib.dump(artifact, out_path)
+    out_path = save_artifact(artifact, "reco_lr.pkl")
+    print(f"✅ Saved model to: {out_path}")
+
+
+# --- tree ensemble: non-linear ranker, served from flat tree arrays (see model_artifact.py) ---
+
+def train_hgb(max_iter: int = 200, learning_rate: float = 0.1, max_leaf_nodes: int = 31) -> Path:
+    df, X_train, X_test, y_train, y_test, w_train, w_test = load_training_split()
+
+    model = HistGradientBoostingClassifier(
+        max_iter=max_iter,
+        learning_rate=learning_rate,
+        max_leaf_nodes=max_leaf_nodes,
+        random_state=42,
+    )
+    model.fit(X_train, y_train, sample_weight=balanced_weights(y_train, w_train))
+
+    proba = model.predict_proba(X_test)[:, 1]
+    auc = roc_auc_score(y_test, proba, sample_weight=w_test)
+    acc = accuracy_score(y_test, (proba >= 0.5).astype(int), sample_weight=w_test)
+
+    print(f"✅ Trained HistGradientBoosting ranker ({model.n_iter_} trees)")
+    print(f"Rows: {len(df)} | Positives: {int(df['label_clicked'].sum())}")
+    print(f"AUC: {auc:.3f} | Accuracy: {acc:.3f}")
+
+    artifact = {
+        "model": model,
+        "feature_cols": FEATURE_COLS,
+    }
+    out_path = save_artifact(artifact, "reco_hgb.pkl")
     print(f"✅ Saved model to: {out_path}")
+    return out_path
+
+
+# --- out-of-core mode: stream parquet batches, fit with partial_fit ---
+
+SGD_BATCH_ROWS = 100_000
+HOLDOUT_FRACTION = 0.2
+SGD_EPOCHS = 3
+SGD_ARTIFACT = "reco_sgd.pkl"
+# rows are shuffled across this many batches per epoch (see iter_parquet_batches)
+SHUFFLE_BUFFER_BATCHES = 8
+
+
+def iter_parquet_batches(
+    path: Path, batch_rows: int = SGD_BATCH_ROWS, seed: Optional[int] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Feature/label columns of a (partitioned) parquet dataset, batch_rows at a time.
+    With a seed, files are visited in random order and rows are mixed across a buffer of
+    SHUFFLE_BUFFER_BATCHES batches, so SGD doesn't see the data partition by partition
+    (date, then service_type). Memory stays ~ buffer x batch_rows.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    if not path.exists():
+        raise FileNotFoundError(f"Dataset not found: {path}. Run build_dataset --stream first.")
+    dataset = ds.dataset(str(path), format="parquet", partitioning="hive")
+    columns = FEATURE_COLS + ["label_clicked", "request_id", "session_key"]
+    if "sample_weight" in dataset.schema.names:
+        columns.append("sample_weight")
+
+    if seed is None:
+        for batch in dataset.to_batches(columns=columns, batch_size=batch_rows):
+            if batch.num_rows:
+                yield batch.to_pandas()
+        return
+
+    rng = np.random.default_rng(seed)
+    fragments = list(dataset.get_fragments())
+    rng.shuffle(fragments)
+
+    def _mixed(buffer: List[pa.RecordBatch]) -> Iterator[pd.DataFrame]:
+        df = pa.Table.from_batches(buffer).to_pandas()
+        df = df.iloc[rng.permutation(len(df))].reset_index(drop=True)
+        for lo in range(0, len(df), batch_rows):
+            yield df.iloc[lo:lo + batch_rows]
+
+    buffer: List[pa.RecordBatch] = []
+    rows = 0
+    for fragment in fragments:
+        for batch in fragment.to_batches(schema=dataset.schema, columns=columns, batch_size=batch_rows):
+            if not batch.num_rows:
+                continue
+            buffer.append(batch)
+            rows += batch.num_rows
+            if rows >= SHUFFLE_BUFFER_BATCHES * batch_rows:
+                yield from _mixed(buffer)
+                buffer, rows = [], 0
+    if buffer:
+        yield from _mixed(buffer)
+
+
+def holdout_mask(df: pd.DataFrame, fraction: float) -> np.ndarray:
+    """
+    Deterministic split by request: every row of a request lands on the same side,
+    and the same request stays on the same side across runs and warm starts.
+    """
+    key = df["request_id"].astype("string").fillna(df["session_key"].astype("string")).fillna("")
+    bucket = pd.util.hash_pandas_object(key, index=False).to_numpy() % 10_000
+    return bucket < int(fraction * 10_000)
+
+
+def _xy(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    X = df[FEATURE_COLS].fillna(0.0).to_numpy(dtype=np.float64)
+    y = df["label_clicked"].fillna(0).to_numpy(dtype=np.int64)
+    return X, y
+
+
+def load_warm_start() -> Dict[str, Any]:
+    """
+    The previous out-of-core artifact (models/reco_sgd.pkl) to continue from. Read directly,
+    not via the manifest: a later batch train moves the manifest to another artifact, and a
+    warm start must not silently fall back to training from scratch.
+    """
+    path = MODEL_DIR / SGD_ARTIFACT
+    if not path.exists():
+        raise FileNotFoundError(f"Warm start requested but {path} does not exist. Train without --warm-start first.")
+    artifact = joblib.load(path)
+    model = artifact.get("model")
+    if (
+        not isinstance(model, Pipeline)
+        or not isinstance(model.steps[-1][1], SGDClassifier)
+        or list(artifact.get("feature_cols", [])) != FEATURE_COLS
+    ):
+        raise RuntimeError(f"{path} is not a compatible SGD artifact (feature columns changed?); cannot warm start.")
+    return artifact
+
+
+def train_sgd(
+    data_dir: Path = PARQUET_DIR,
+    batch_rows: int = SGD_BATCH_ROWS,
+    epochs: int = SGD_EPOCHS,
+    holdout: float = HOLDOUT_FRACTION,
+    warm_start: bool = False,
+) -> Path:
+    """
+    Out-of-core logistic ranker: StandardScaler + SGDClassifier(log_loss) fit batch by batch,
+    so memory depends on batch_rows, not on dataset size. Held-out requests (by hash) are
+    never trained on and scored in a final pass.
+    """
+    t0 = time.perf_counter()
+    previous = load_warm_start() if warm_start else None
+
+    if previous is not None:
+        model: Pipeline = previous["model"]
+        scaler, clf = model.steps[0][1], model.steps[-1][1]
+        print(f"✅ Warm start from version {previous.get('version')}")
+    else:
+        scaler = StandardScaler()
+        # averaged SGD: far less sensitive to batch order and step size than the last iterate
+        clf = SGDClassifier(loss="log_loss", alpha=1e-4, learning_rate="optimal", average=True, random_state=42)
+        model = Pipeline([("scaler", scaler), ("clf", clf)])
+
+    # pass 1: class balance (partial_fit can't do class_weight="balanced") + scaler statistics,
+    # both on weighted counts so downsampled negatives stand for the rows they replace
+    pos = neg = 0.0
+    n_rows = 0
+    for df in iter_parquet_batches(data_dir, batch_rows):
+        train = df[~holdout_mask(df, holdout)]
+        if train.empty:
+            continue
+        X, y = _xy(train)
+        w = row_weights(train)
+        pos += float(w[y == 1].sum())
+        neg += float(w[y == 0].sum())
+        n_rows += len(y)
+        if previous is None:
+            scaler.partial_fit(X, sample_weight=w)  # a warm-started model keeps the scaling its coefs were fit on
+
+    if pos == 0 or neg == 0:
+        raise RuntimeError("Training split needs both clicked and non-clicked rows.")
+    n = pos + neg
+    class_weight = {0: n / (2.0 * neg), 1: n / (2.0 * pos)}
+
+    # pass 2..: SGD epochs, each in a fresh shuffled order
+    for epoch in range(epochs):
+        for df in iter_parquet_batches(data_dir, batch_rows, seed=42 + epoch):
+            train = df[~holdout_mask(df, holdout)]
+            if train.empty:
+                continue
+            X, y = _xy(train)
+            weight = np.where(y == 1, class_weight[1], class_weight[0]) * row_weights(train)
+            clf.partial_fit(scaler.transform(X), y, classes=np.array([0, 1]), sample_weight=weight)
+
+    # held-out evaluation
+    proba_parts, label_parts, weight_parts = [], [], []
+    for df in iter_parquet_batches(data_dir, batch_rows):
+        test = df[holdout_mask(df, holdout)]
+        if test.empty:
+            continue
+        X, y = _xy(test)
+        proba_parts.append(clf.predict_proba(scaler.transform(X))[:, 1].astype(np.float32))
+        label_parts.append(y.astype(np.int8))
+        weight_parts.append(row_weights(test).astype(np.float32))
+
+    print(f"✅ Trained SGD logistic ranker (out-of-core, {epochs} epoch(s))")
+    print(f"Train rows: {n_rows} (weighted {n:.0f}) | Positives: {pos:.0f} | {time.perf_counter() - t0:.1f}s")
+    if proba_parts:
+        proba, y_test = np.concatenate(proba_parts), np.concatenate(label_parts)
+        w_test = np.concatenate(weight_parts)
+        if 0 < y_test.sum() < len(y_test):
+            auc = roc_auc_score(y_test, proba, sample_weight=w_test)
+            acc = accuracy_score(y_test, (proba >= 0.5).astype(int), sample_weight=w_test)
+            print(f"Holdout rows: {len(y_test)} | AUC: {auc:.3f} | Accuracy: {acc:.3f}")
+        else:
+            print(f"Holdout rows: {len(y_test)} | single class, AUC undefined")
+
+    artifact = {
+        "model": model,
+        "feature_cols": FEATURE_COLS,
+        "trained_rows": n_rows + (previous or {}).get("trained_rows", 0),
+        "parent_version": (previous or {}).get("version"),
+    }
+    out_path = save_artifact(artifact, SGD_ARTIFACT)
+    print(f"✅ Saved model to: {out_path}")
+    return out_path
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Train the recommendation ranker.")
+    parser.add_argument(
+        "--mode", choices=["batch", "sgd", "hgb"], default="batch",
+        help="batch: LogisticRegression on the CSV in memory; sgd: out-of-core on the parquet dataset; "
+        "hgb: HistGradientBoosting trees on the CSV",
+    )
+    parser.add_argument("--data-dir", type=Path, default=PARQUET_DIR, help="parquet dataset (sgd mode)")
+    parser.add_argument("--batch-rows", type=int, default=SGD_BATCH_ROWS)
+    parser.add_argument("--epochs", type=int, default=SGD_EPOCHS, help="sgd mode")
+    parser.add_argument("--holdout", type=float, default=HOLDOUT_FRACTION, help="fraction of requests held out")
+    parser.add_argument("--warm-start", action="store_true", help=f"continue from models/{SGD_ARTIFACT}")
+    parser.add_argument("--max-iter", type=int, default=200, help="boosting iterations (hgb mode)")
+    parser.add_argument("--learning-rate", type=float, default=0.1, help="hgb mode")
+    parser.add_argument("--max-leaf-nodes", type=int, default=31, help="hgb mode")
+    args = parser.parse_args(argv)
+
+    if args.mode == "sgd":
+        train_sgd(args.data_dir, args.batch_rows, args.epochs, args.holdout, args.warm_start)
+    elif args.mode == "hgb":
+        train_hgb(args.max_iter, args.learning_rate, args.max_leaf_nodes)
+    else:
+        train_batch()
+
+
+def save_artifact(artifact: dict, filename: str) -> Path:
+    """
+    Writes the artifact atomically (plus a portable .npz for linear and tree models) and points
+    models/manifest.json at it, so serving workers pick the new version up without a restart.
+    """
+    # microseconds + a random suffix: two saves in the same second (sweep refit followed by a
+    # manual train, two trainers) must not share a version, or the registry skips the second one
+    version = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+    artifact["version"] = version
+
+    out_path = MODEL_DIR / filename
+    tmp_path = out_path.with_suffix(out_path.suffix + ".tmp")
+    joblib.dump(artifact, tmp_path)
+    os.replace(tmp_path, out_path)
+
+    manifest = {"artifact": filename, "version": version}
+
+    # numeric copy for serving (no sklearn/joblib needed to load it)
+    portable = to_portable(artifact)
+    if portable is not None:
+        portable_path = save_portable(portable, out_path.with_suffix(".npz"))
+        manifest["portable"] = portable_path.name
+    manifest_tmp = MODEL_DIR / "manifest.json.tmp"
+    manifest_tmp.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(manifest_tmp, MODEL_DIR / "manifest.json")
+    return out_path
 
 
 if __name__ == "__main__":
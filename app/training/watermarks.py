@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+# bytes of a segment's start used to recognise it (together with dev/inode)
+HEAD_BYTES = 4096
+
+
+def head_fingerprint(path: Path, length: int) -> str:
+    with path.open("rb") as f:
+        return hashlib.sha1(f.read(length)).hexdigest()
+
+
+def log_segments(log_path: Path) -> List[Path]:
+    """
+    The live log plus rotated copies next to it (reco_events.jsonl.1, ...), oldest first.
+    """
+    rotated = [p for p in log_path.parent.glob(log_path.name + ".*") if p.suffix not in (".gz", ".tmp")]
+    segments = rotated + ([log_path] if log_path.exists() else [])
+    return sorted(segments, key=lambda p: p.stat().st_mtime_ns)
+
+
+@dataclass
+class SegmentWatermark:
+    path: str
+    dev: int
+    inode: int
+    head_len: int
+    head_sha1: str
+    offset: int  # bytes already processed (always at a line boundary)
+    updated_at: str
+
+
+class WatermarkStore:
+    """
+    Persisted read position per log segment.
+    A segment is only resumed if it is still the same file: same dev/inode and the same
+    first bytes. Marks are keyed by dev/inode, so a rotated (renamed) file keeps its mark
+    and the new file under the old name gets its own; a truncated or replaced file starts from 0.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._marks: Dict[Tuple[int, int], SegmentWatermark] = {}
+        if path.exists():
+            raw = json.loads(path.read_text(encoding="utf-8"))
+            for v in raw.get("segments", {}).values():
+                mark = SegmentWatermark(**v)
+                self._marks[(mark.dev, mark.inode)] = mark
+
+    def __len__(self) -> int:
+        return len(self._marks)
+
+    def resume_offset(self, segment: Path) -> int:
+        st = segment.stat()
+        mark = self._marks.get((st.st_dev, st.st_ino))
+        if (
+            mark is not None
+            and st.st_size >= mark.offset
+            and head_fingerprint(segment, mark.head_len) == mark.head_sha1
+        ):
+            return mark.offset
+        return 0
+
+    def advance(self, segment: Path, offset: int) -> None:
+        """Files the mark under the segment's current path; call it for every segment seen."""
+        st = segment.stat()
+        head_len = min(HEAD_BYTES, offset)
+        self._marks[(st.st_dev, st.st_ino)] = SegmentWatermark(
+            path=str(segment),
+            dev=st.st_dev,
+            inode=st.st_ino,
+            head_len=head_len,
+            head_sha1=head_fingerprint(segment, head_len),
+            offset=offset,
+            updated_at=datetime.utcnow().isoformat(),
+        )
+
+    def to_json(self) -> Dict[str, Any]:
+        # files that are gone (deleted rotations) are dropped
+        return {
+            "segments": {
+                f"{m.dev}:{m.inode}": asdict(m) for m in self._marks.values() if Path(m.path).exists()
+            }
+        }
+
+    def save(self) -> None:
+        _write_json(self.path, self.to_json())
+
+
+def _write_json(path: Path, data: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class CommitJournal:
+    """
+    Makes one incremental run's output visible together with its watermarks.
+    New and rewritten parquet parts are written as hidden dot-files first (parquet readers skip
+    them). commit() then records what to publish, what to remove and the new watermarks in
+    one atomic journal write -- the commit point -- and applies it. recover() at the start of
+    the next run finishes a commit that was interrupted, or deletes the hidden files of a run
+    that never reached its commit point (its log bytes are re-read since the marks didn't move).
+    """
+
+    def __init__(self, path: Path, watermark_path: Path):
+        self.path = path
+        self.watermark_path = watermark_path
+
+    def commit(self, publish: List[Tuple[Path, Path]], remove: List[Path], marks: WatermarkStore) -> None:
+        _write_json(self.path, {
+            "publish": [[str(src), str(dst)] for src, dst in publish],
+            "remove": [str(p) for p in remove],
+            "watermarks": marks.to_json(),
+        })
+        self._apply()
+
+    def recover(self, root: Path) -> bool:
+        """True if an interrupted commit was completed."""
+        if self.path.exists():
+            self._apply()
+            return True
+        for stale in root.rglob(".part-*.parquet"):
+            stale.unlink()
+        return False
+
+    def _apply(self) -> None:
+        # idempotent: safe to re-run after a crash at any point
+        journal = json.loads(self.path.read_text(encoding="utf-8"))
+        # publish before removing what it replaces; a crash in between is finished by recover()
+        for src, dst in journal["publish"]:
+            if Path(src).exists():
+                os.replace(src, dst)
+        for old in journal["remove"]:
+            Path(old).unlink(missing_ok=True)
+        _write_json(self.watermark_path, journal["watermarks"])
+        self.path.unlink()